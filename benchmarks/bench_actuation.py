@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import time
+
+from bench_servers import free_port, load_script, summarize, wait_listening
+
+from asyncua import Client
+from opcua_common.sim_clock import FAST, SimClock
+
+STEP = 1.0  # simulated seconds the servers wait between servo commands
+
+TARGETS = {
+    "move_arm": ("opcua_cobot_server", "opcuaprojectcobot/opcua_cobot_server.py", "cobot_arm",
+                 ("cobot interface", "move functions channel"), (True,)),
+    "move_and_supply": ("opcua_conveyor_server", "opcuaprojectconveyor/opcua_conveyor_server.py", "conveyor",
+                        ("conveyor interface",), ()),
+}
+
+
+async def bench_method(method, args):
+    module_name, path, uri, parent_path, call_args = TARGETS[method]
+    module = load_script(module_name, path)
+    module.clock = clock = SimClock.from_string(args.clock)
+    backend = module.actuators
+    speed = 0.0 if clock.mode == FAST else 1.0 / clock.speed
+
+    port = free_port()
+    endpoint = f"opc.tcp://127.0.0.1:{port}/{uri}"
+    server_task = asyncio.create_task(module.start_server(endpoint))
+    await wait_listening(port)
+
+    latencies, intervals, jitters, cycle_times, call_times = [], [], [], [], []
+    commands = steps = 0
+    nominal_cycle = 0.0
+    # The servers answer nothing else on a connection while a method runs, so
+    # the default one-second keep-alive probe would drop the session.
+    async with Client(endpoint, timeout=60, watchdog_intervall=3600) as client:
+        ns = await client.get_namespace_index(uri)
+        parent = await client.nodes.objects.get_child([f"{ns}:{name}" for name in parent_path])
+        method_node = await parent.get_child(f"{ns}:{method}")
+        for _ in range(args.cycles):
+            start = time.perf_counter()
+            await parent.call_method(method_node, *call_args)
+            call_times.append(time.perf_counter() - start)
+            # start(0) when a channel is created is not a servo command.
+            times = [t for t, pin, duty_cycle in backend.events_since(start) if duty_cycle > 0.0]
+            if not times:
+                continue
+            # Waypoint motions command several joints per step and wait as
+            # long as the executor planned; other methods wait STEP per command.
+            executor = getattr(module, "executor", None)
+            plan = executor.last_run if executor is not None else [(1, STEP)] * len(times)
+            step_times, waits, index = [], [], 0
+            for step_commands, wait in plan:
+                if not step_commands:
+                    # Every joint was already there; only the wait counts.
+                    if waits:
+                        waits[-1] += wait * speed
+                    continue
+                step_times.append(times[index])
+                waits.append(wait * speed)
+                index += step_commands
+            commands, steps = len(times), len(step_times)
+            nominal_cycle = sum(waits[:-1])
+            latencies.append(times[0] - start)
+            cycle_times.append(step_times[-1] - step_times[0])
+            for previous, current, wait in zip(step_times, step_times[1:], waits):
+                intervals.append(current - previous)
+                jitters.append(abs(current - previous - wait))
+
+    server_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await server_task
+    channels = module.channels
+    return {
+        "servo_commands": commands,
+        "duty_writes": channels.writes,
+        "elided_writes": channels.elided,
+        "steps": steps,
+        "nominal_cycle_ms": nominal_cycle * 1000.0,
+        "actuation_latency": summarize(latencies),
+        "step_interval": summarize(intervals),
+        "step_jitter": summarize(jitters),
+        "cycle_time": summarize(cycle_times),
+        "call_time": summarize(call_times),
+    }
+
+
+async def run(args):
+    results = {}
+    for method in args.methods:
+        print(f"Timing {method}...", file=sys.stderr)
+        results[method] = await bench_method(method, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Servo timing of move_arm and move_and_supply on the simulated actuator backend.")
+    parser.add_argument("--methods", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument("--cycles", type=int, default=5, help="method calls per method")
+    parser.add_argument("--clock", default="10x",
+                        help="simulation clock (default: 10x, so one servo step takes 100 ms)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    if args.cycles < 1:
+        parser.error("--cycles must be at least 1")
+
+    logging.basicConfig(level=logging.ERROR)
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run(args))
+    text = json.dumps({"parameters": {"cycles": args.cycles, "clock": args.clock}, "methods": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from asyncua import Client, Server, ua
+from block_writer import BlockWriter
+from cnc_simulator import OPCUAServer
+
+ENDPOINT = "opc.tcp://127.0.0.1:48401/bench_block_writes"
+BLOCKS = 2000
+
+
+class NotificationCounter:
+    def __init__(self):
+        self.count = 0
+        self.source_timestamps = set()
+
+    def datachange_notification(self, node, val, data):
+        self.count += 1
+        self.source_timestamps.add(data.monitored_item.Value.SourceTimestamp)
+
+
+def block_values(i):
+    return (i * 0.01, 1.0 + i * 0.001, 0.5, -i * 0.01, 2.0, 0.25, 450.0 + i % 7, 0.002 * (1 + i % 3))
+
+
+async def sequential_writes(cnc, i):
+    x, x_vel, x_acc, z, z_vel, z_acc, spindle, feed = block_values(i)
+    await cnc.x_position_direct.write_value(x)
+    await cnc.x_velocity.write_value(x_vel)
+    await cnc.x_acceleration.write_value(x_acc)
+    await cnc.z_position_direct.write_value(z)
+    await cnc.z_velocity.write_value(z_vel)
+    await cnc.z_acceleration.write_value(z_acc)
+    await cnc.mydtvar.write_value(datetime.now(timezone.utc))
+    await cnc.spindle_speed_direct.write_value(spindle)
+    await cnc.feed_rate_direct.write_value(feed)
+
+
+async def batched_writes(cnc, i):
+    x, x_vel, x_acc, z, z_vel, z_acc, spindle, feed = block_values(i)
+    writer = cnc.block_writer
+    now = datetime.now(timezone.utc)
+    writer.set(cnc.x_position_direct, x)
+    writer.set(cnc.x_velocity, x_vel)
+    writer.set(cnc.x_acceleration, x_acc)
+    writer.set(cnc.z_position_direct, z)
+    writer.set(cnc.z_velocity, z_vel)
+    writer.set(cnc.z_acceleration, z_acc)
+    writer.set(cnc.mydtvar, now, ua.VariantType.DateTime)
+    writer.set(cnc.spindle_speed_direct, spindle)
+    writer.set(cnc.feed_rate_direct, feed)
+    await writer.commit(now)
+
+
+async def run(name, cnc, write_block, nodes):
+    counter = NotificationCounter()
+    async with Client(ENDPOINT) as client:
+        subscription = await client.create_subscription(50, counter)
+        await subscription.subscribe_data_change([client.get_node(node.nodeid) for node in nodes])
+        await asyncio.sleep(0.5)
+        counter.count = 0
+        counter.source_timestamps.clear()
+
+        start = time.perf_counter()
+        for i in range(BLOCKS):
+            await write_block(cnc, i)
+            if i % 50 == 0:
+                await asyncio.sleep(0)
+        write_time = time.perf_counter() - start
+        await asyncio.sleep(1.0)
+        elapsed = time.perf_counter() - start
+        await subscription.delete()
+
+    print(f"{name:<11} {BLOCKS / write_time:9.0f} blocks/s  "
+          f"{write_time / BLOCKS * 1e6:7.1f} us/block  "
+          f"{counter.count:6d} notifications  {counter.count / elapsed:8.0f} notifications/s  "
+          f"{len(counter.source_timestamps):5d} source timestamps")
+
+
+async def main():
+    cnc = OPCUAServer(ENDPOINT, "bench_block_writes")
+    server = Server()
+    await server.init()
+    server.set_endpoint(ENDPOINT)
+    namespace_id = await server.register_namespace(cnc.uri)
+    await cnc.generate_opc_model(server, namespace_id)
+    cnc.block_writer = BlockWriter(server)
+    nodes = [cnc.x_position_direct, cnc.x_velocity, cnc.x_acceleration,
+             cnc.z_position_direct, cnc.z_velocity, cnc.z_acceleration,
+             cnc.mydtvar, cnc.spindle_speed_direct, cnc.feed_rate_direct]
+
+    async with server:
+        print(f"{BLOCKS} blocks, 9 variables per block, one subscription at 50 ms")
+        await run("sequential", cnc, sequential_writes, nodes)
+        await run("batched", cnc, batched_writes, nodes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
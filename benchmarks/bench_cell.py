@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+
+from bench_servers import ROOT, free_port, load_script, wait_listening
+
+sys.path.insert(0, os.path.join(ROOT, "opcuaprojectcell"))
+
+from opcua_cell_orchestrator import CellOrchestrator, STRICT
+from opcua_common.sim_clock import SimClock
+
+
+async def bench_overlap(overlap_after, args):
+    tasks = []
+    endpoints = {}
+    for name, path, uri in (("cobot", "opcuaprojectcobot/opcua_cobot_server.py", "cobot_arm"),
+                            ("conveyor", "opcuaprojectconveyor/opcua_conveyor_server.py", "conveyor")):
+        module = load_script(f"opcua_{name}_server", path)
+        module.clock = SimClock.from_string(args.clock)
+        port = free_port()
+        endpoints[name] = f"opc.tcp://127.0.0.1:{port}/{uri}"
+        tasks.append(asyncio.create_task(module.start_server(endpoints[name])))
+        await wait_listening(port)
+
+    orchestrator = CellOrchestrator(conveyor_endpoint=endpoints["conveyor"], cobot_endpoint=endpoints["cobot"],
+                                    overlap_after=overlap_after)
+    await orchestrator.connect()
+    await orchestrator.run(args.parts)
+    await orchestrator.disconnect()
+
+    for task in tasks:
+        task.cancel()
+    for task in asyncio.all_tasks():
+        # monitor_button() and the command queue outlive their server.
+        if task is not asyncio.current_task():
+            task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await asyncio.gather(*tasks)
+
+    elapsed = orchestrator.elapsed
+    return {
+        "state": orchestrator.state,
+        "parts": orchestrator.parts_done,
+        "elapsed_s": elapsed,
+        "throughput_parts_per_hour": orchestrator.throughput,
+        "cycle_time_s": orchestrator.cycle_time,
+        "stages": {name: {"utilization_percent": stage.utilization(elapsed), "busy_s": stage.busy,
+                          "stall_s": stage.stalled, "runs": stage.runs}
+                   for name, stage in orchestrator.stages.items()},
+    }
+
+
+async def run(args):
+    results = {}
+    for overlap_after in args.overlap_after:
+        print(f"Running the cell with overlap after {overlap_after}...", file=sys.stderr)
+        results[overlap_after] = await bench_overlap(overlap_after, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput of the pick-and-place cell, strictly sequenced and pipelined.")
+    parser.add_argument("--overlap-after", nargs="+", default=[STRICT, "returning"],
+                        help=f"overlap rules to compare (default: {STRICT} returning)")
+    parser.add_argument("--parts", type=int, default=5, help="parts per run")
+    parser.add_argument("--clock", default="4x", help="simulation clock of both servers (default: 4x)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    if args.parts < 1:
+        parser.error("--parts must be at least 1")
+
+    logging.basicConfig(level=logging.CRITICAL)
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run(args))
+    text = json.dumps({"parameters": {"parts": args.parts, "clock": args.clock}, "runs": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from gcode_parser import GCodeParser
+
+LINES = 100_000
+
+
+def make_turning_program(line_count):
+    lines = ["%", "(Generated roughing program)", "G00 G18 G54 G40 G80 G90.1", "T0101",
+             "G99 (Feed per Revolution)", "G96 S450 (Constant Surface Speed)", "M03", "M08"]
+    x = 4.2
+    while len(lines) < line_count:
+        x = x - 0.05 if x > 2.0 else 4.2
+        lines.append(f"G00 X{x + 0.3:.4f} Z0.2000 (Rapid to Clearance)")
+        lines.append(f"G01 X{x:.4f} F0.0020")
+        lines.append("G01 Z-4.8000 F0.0020")
+        lines.append(f"G01 X{x + 0.1:.4f} Z-4.8000 F0.0020")
+        lines.append(f"G00 X{x + 0.3:.4f} Z-4.6000")
+    lines = lines[:line_count - 2]
+    lines += ["M05", "M30"]
+    return "\n".join(lines)
+
+
+def legacy_parse(gcode_str):
+    count = 0
+    for line in gcode_str.strip().split('\n'):
+        line = line.strip()
+        if not line or line.startswith('(') or line.startswith('%'):
+            continue
+        match = re.match(r'(G0[01])\s*(X([-+]?[0-9]*\.?[0-9]+))?\s*(Z([-+]?[0-9]*\.?[0-9]+))?', line)
+        if match:
+            x_value = match.group(3)
+            z_value = match.group(5)
+            if x_value is not None:
+                float(x_value)
+            if z_value is not None:
+                float(z_value)
+        spindle_match = re.search(r'S([-+]?[0-9]*\.?[0-9]+)', line, re.IGNORECASE)
+        if spindle_match:
+            float(spindle_match.group(1))
+        feedrate_match = re.search(r'F([-+]?[0-9]*\.?[0-9]+)', line, re.IGNORECASE)
+        if feedrate_match:
+            float(feedrate_match.group(1))
+        count += 1
+    return count
+
+
+def tokenizer_parse(gcode_str):
+    count = 0
+    for _ in GCodeParser().iter_blocks(gcode_str.splitlines()):
+        count += 1
+    return count
+
+
+def bench(name, func, program, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func(program)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<12} {count:>8} blocks  {best * 1000:9.1f} ms  {best / LINES * 1e6:6.2f} us/line")
+
+
+if __name__ == "__main__":
+    program = make_turning_program(LINES)
+    print(f"{LINES} line turning program, {len(program) / 1e6:.1f} MB")
+    bench("legacy re", legacy_parse, program)
+    bench("tokenizer", tokenizer_parse, program)
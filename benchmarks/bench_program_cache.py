@@ -0,0 +1,56 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from bench_gcode_parser import make_turning_program
+from motion_planner import MotionPlanner
+from program_cache import ProgramCache, program_hash
+
+LINES = 20_000
+START = (0.0, 0.0)
+
+
+def cold(program, cache_dir):
+    cache = ProgramCache()
+    cache.plan(cache.compile(program), MotionPlanner(), START)
+
+
+def memory_hit(cache, program):
+    cache.plan(cache.compile(program), MotionPlanner(), START)
+
+
+def by_reference(cache, key):
+    cache.plan(cache.lookup(key), MotionPlanner(), START)
+
+
+def warm_restart(program, cache_dir):
+    cache = ProgramCache(cache_dir=cache_dir)
+    cache.plan(cache.compile(program), MotionPlanner(), START)
+
+
+def bench(name, func, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<14} {best * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    program = make_turning_program(LINES)
+    cache_dir = tempfile.mkdtemp(prefix="bench_program_cache_")
+    try:
+        cache = ProgramCache(cache_dir=cache_dir)
+        cache.plan(cache.compile(program), MotionPlanner(), START)
+        print(f"{LINES} line turning program, parse and plan")
+        bench("cold", cold, program, cache_dir)
+        bench("warm restart", warm_restart, program, cache_dir)
+        bench("memory hit", memory_hit, cache, program)
+        bench("by reference", by_reference, cache, program_hash(program))
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "opcua_sample_servers"))
+
+import asyncua
+from asyncua import Client
+from cnc_simulator import OPCUAServer
+from opcua_common.actuators import BACKEND_ENV_VAR, SIMULATED
+from opcua_common.sim_clock import SimClock
+
+# Inherited by the worker processes; the cobot and conveyor pick their
+# actuator backend when they are loaded.
+os.environ[BACKEND_ENV_VAR] = SIMULATED
+
+SERVERS = ("cnc", "cobot", "conveyor")
+CNC_PROGRAM = "G21 G98\nG00 X10 Z2\nG01 Z-20 F600\nG01 X14\nG00 X16 Z2\nG00 X0 Z0"
+
+
+def load_script(name, path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def summarize(samples):
+    # Latencies in seconds to a dict of milliseconds; nearest-rank percentiles.
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def percentile(p):
+        return ordered[min(count - 1, max(0, round(p / 100.0 * count + 0.5) - 1))] * 1000.0
+
+    return {"count": count, "mean_ms": sum(ordered) / count * 1000.0, "p50_ms": percentile(50),
+            "p90_ms": percentile(90), "p99_ms": percentile(99), "max_ms": ordered[-1] * 1000.0}
+
+
+class CncTarget:
+    uri = "bench_cnc"
+    methods = ((("cnc interface", "cnc channel list", "g function channel"), "run_g_code", (CNC_PROGRAM,)),
+               (("cnc interface", "cnc channel list"), "stop_cnc_machine", ()))
+    monitored = (("cnc interface", "cnc axis list", "x axis", "x position direct"),
+                 ("cnc interface", "cnc axis list", "x axis", "x velocity"),
+                 ("cnc interface", "cnc axis list", "z axis", "z position direct"),
+                 ("cnc interface", "cnc axis list", "z axis", "z velocity"),
+                 ("cnc interface", "cnc channel list", "timestamp channel", "server timestamp"))
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.simulator = None
+
+    def start(self, endpoint):
+        self.simulator = OPCUAServer(endpoint, self.uri, clock=self.clock)
+        return asyncio.create_task(self.simulator.start_server())
+
+    async def stop(self, task):
+        self.simulator.server_running = False
+        await task
+
+
+class ScriptTarget:
+    # The cobot and conveyor servers are plain scripts; start_server() runs
+    # until it is cancelled.
+    def __init__(self, module, uri, methods, monitored, clock):
+        self.module = module
+        self.uri = uri
+        self.methods = methods
+        self.monitored = monitored
+        module.clock = clock
+
+    def start(self, endpoint):
+        return asyncio.create_task(self.module.start_server(endpoint))
+
+    async def stop(self, task):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+def make_target(name, clock):
+    if name == "cnc":
+        return CncTarget(clock)
+    if name == "cobot":
+        module = load_script("opcua_cobot_server", "opcuaprojectcobot/opcua_cobot_server.py")
+        return ScriptTarget(module, "cobot_arm",
+                            ((("cobot interface",), "reference_cobot", ()),
+                             (("cobot interface", "move functions channel"), "move_arm", (True,))),
+                            (("cobot interface", "server timestamp"),), clock)
+    module = load_script("opcua_conveyor_server", "opcuaprojectconveyor/opcua_conveyor_server.py")
+    return ScriptTarget(module, "conveyor",
+                        ((("conveyor interface",), "initialize", ()),
+                         (("conveyor interface",), "move_and_supply", ())),
+                        (("conveyor interface", "server timestamp"),), clock)
+
+
+class NotificationCounter:
+    def __init__(self):
+        self.count = 0
+
+    def datachange_notification(self, node, val, data):
+        self.count += 1
+
+
+async def wait_listening(port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            await writer.wait_closed()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.01)
+
+
+class BenchClient:
+    def __init__(self, endpoint, target, publish_interval):
+        self.client = Client(endpoint, timeout=30)
+        self.target = target
+        self.publish_interval = publish_interval
+        self.counter = NotificationCounter()
+        self.calls = []
+
+    async def connect(self):
+        start = time.perf_counter()
+        await self.client.connect()
+        elapsed = time.perf_counter() - start
+        ns = await self.client.get_namespace_index(self.target.uri)
+        objects = self.client.nodes.objects
+        for path, method, args in self.target.methods:
+            parent = await objects.get_child([f"{ns}:{name}" for name in path])
+            self.calls.append((method, parent, await parent.get_child(f"{ns}:{method}"), args))
+        nodes = [await objects.get_child([f"{ns}:{name}" for name in path]) for path in self.target.monitored]
+        subscription = await self.client.create_subscription(self.publish_interval, self.counter)
+        await subscription.subscribe_data_change(nodes)
+        return elapsed
+
+    async def call(self, index):
+        method, parent, method_node, args = self.calls[index % len(self.calls)]
+        start = time.perf_counter()
+        result = await parent.call_method(method_node, *args)
+        elapsed = time.perf_counter() - start
+        accepted = (result[0] if isinstance(result, list) else result) is not False
+        return method, elapsed, accepted
+
+    async def disconnect(self):
+        with contextlib.suppress(Exception):
+            await self.client.disconnect()
+
+
+async def bench_server(name, args):
+    clock = SimClock.from_string(args.clock)
+    target = make_target(name, clock)
+    port = free_port()
+    endpoint = f"opc.tcp://127.0.0.1:{port}/{target.uri}"
+    tasks_before = asyncio.all_tasks()
+
+    rss_before = rss_kb()
+    start = time.perf_counter()
+    server_task = target.start(endpoint)
+    await wait_listening(port)
+    startup = time.perf_counter() - start
+    rss_started = rss_kb()
+
+    clients = [BenchClient(endpoint, target, args.publish_interval) for _ in range(args.clients)]
+    connect_times = await asyncio.gather(*(client.connect() for client in clients))
+    for client in clients:
+        client.counter.count = 0
+
+    latencies = {method: [] for _, method, _ in target.methods}
+    rejected = {method: 0 for _, method, _ in target.methods}
+
+    async def drive(client, offset):
+        i = offset
+        while time.perf_counter() < load_end:
+            method, elapsed, accepted = await client.call(i)
+            latencies[method].append(elapsed)
+            if not accepted:
+                rejected[method] += 1
+            i += 1
+
+    load_start = time.perf_counter()
+    load_end = load_start + args.duration
+    await asyncio.gather(*(drive(client, i) for i, client in enumerate(clients)))
+    load_time = time.perf_counter() - load_start
+    notifications = sum(client.counter.count for client in clients)
+    rss_loaded = rss_kb()
+
+    await asyncio.gather(*(client.disconnect() for client in clients))
+    await target.stop(server_task)
+    for task in asyncio.all_tasks() - tasks_before:
+        # monitor_button() and unfinished jobs outlive their server.
+        if task is not asyncio.current_task():
+            task.cancel()
+
+    all_calls = sum(len(samples) for samples in latencies.values())
+    return {
+        "endpoint": endpoint,
+        "startup_s": startup,
+        "rss_kb": {"before": rss_before, "started": rss_started, "loaded": rss_loaded,
+                   "server_delta": rss_started - rss_before, "load_delta": rss_loaded - rss_started},
+        "connect": summarize(connect_times),
+        "methods": {method: dict(summarize(samples), rejected=rejected[method])
+                    for method, samples in latencies.items()},
+        "all_methods": summarize([t for samples in latencies.values() for t in samples]),
+        "load_s": load_time,
+        "calls_per_s": all_calls / load_time,
+        "notifications": notifications,
+        "notifications_per_s": notifications / load_time,
+    }
+
+
+def bench_in_worker(name, args):
+    logging.basicConfig(level=logging.ERROR)
+    # The servers print every method call; keep stdout for the report.
+    with contextlib.redirect_stdout(sys.stderr):
+        return asyncio.run(bench_server(name, args))
+
+
+def run(args):
+    # Every server gets a fresh worker process, so its RSS is not inflated by
+    # the servers benchmarked before it. Clients run in the same worker.
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in args.servers:
+        print(f"Benchmarking {name} server...", file=sys.stderr)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(bench_in_worker, name, args).result()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the CNC, cobot and conveyor servers.")
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    parser.add_argument("--clients", type=int, default=20, help="concurrent asyncua clients per server")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of method calls per server")
+    parser.add_argument("--publish-interval", type=float, default=50, help="subscription publishing interval in ms")
+    parser.add_argument("--clock", default="fast", help="simulation clock for motion timing (default: fast)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    if args.clients < 1 or args.duration <= 0:
+        parser.error("--clients and --duration must be positive")
+
+    results = run(args)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                        "platform": platform.platform(), "machine": platform.machine(),
+                        "cpu_count": os.cpu_count(), "asyncua": getattr(asyncua, "__version__", None)},
+        "parameters": {"clients": args.clients, "duration_s": args.duration,
+                       "publish_interval_ms": args.publish_interval, "clock": args.clock},
+        "servers": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
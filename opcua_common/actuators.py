@@ -0,0 +1,229 @@
+import os
+import time
+from collections import deque
+
+BACKEND_ENV_VAR = "OPCUA_ACTUATOR_BACKEND"
+GPIO = "gpio"
+SIMULATED = "sim"
+
+
+class GpioBackend:
+    # Servo PWM channels and the shutdown button on a Raspberry Pi (BCM
+    # numbering). RPi.GPIO is only imported here, so the servers load on any
+    # machine as long as the simulated backend is selected.
+    name = GPIO
+
+    def __init__(self):
+        import RPi.GPIO
+        self.gpio = RPi.GPIO
+        self.gpio.setmode(self.gpio.BCM)
+        self.pwm_objects = {}
+
+    def pwm(self, pin, frequency=50):
+        if pin not in self.pwm_objects:
+            # cleanup() also resets the numbering mode.
+            self.gpio.setmode(self.gpio.BCM)
+            self.gpio.setup(pin, self.gpio.OUT)
+            new_pwm = self.gpio.PWM(pin, frequency)
+            new_pwm.start(0)
+            self.pwm_objects[pin] = new_pwm
+        return self.pwm_objects[pin]
+
+    def stop_all(self):
+        for pwm_obj in self.pwm_objects.values():
+            pwm_obj.stop()
+        self.pwm_objects.clear()
+
+    def setup_button(self, pin):
+        self.gpio.setmode(self.gpio.BCM)
+        self.gpio.setup(pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+
+    def button_pressed(self, pin):
+        # Buttons pull the input low.
+        return self.gpio.input(pin) == 0
+
+    def watch_button(self, pin, callback, debounce=0.05):
+        # RPi.GPIO calls callback(pin) from its own thread on every press.
+        # A pin takes one edge detection; replace a previous server's.
+        self.gpio.remove_event_detect(pin)
+        self.gpio.add_event_detect(pin, self.gpio.FALLING, callback=callback,
+                                   bouncetime=max(1, int(debounce * 1000)))
+
+    def cleanup(self):
+        self.pwm_objects.clear()
+        self.gpio.cleanup()
+
+    def shutdown(self):
+        os.system("sudo shutdown -h now")
+
+
+class SimulatedPWM:
+    def __init__(self, backend, pin, frequency):
+        self.backend = backend
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0.0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = float(duty_cycle)
+        self.backend.record(self.pin, self.duty_cycle)
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+class SimulatedBackend:
+    # Same interface without hardware. Every duty-cycle change is recorded as
+    # (time.perf_counter(), pin, duty cycle) in `events`, so actuation
+    # latency, step jitter and cycle times can be measured on any machine.
+    name = SIMULATED
+
+    def __init__(self, max_events=100_000):
+        self.events = deque(maxlen=max_events)
+        self.pwm_objects = {}
+        self.buttons = set()
+        self.pressed = set()
+        self.button_callbacks = {}
+        self.shutdown_requested = False
+
+    def pwm(self, pin, frequency=50):
+        if pin not in self.pwm_objects:
+            new_pwm = SimulatedPWM(self, pin, frequency)
+            new_pwm.start(0)
+            self.pwm_objects[pin] = new_pwm
+        return self.pwm_objects[pin]
+
+    def record(self, pin, duty_cycle):
+        self.events.append((time.perf_counter(), pin, duty_cycle))
+
+    def events_since(self, start):
+        return [event for event in self.events if event[0] >= start]
+
+    def stop_all(self):
+        for pwm_obj in self.pwm_objects.values():
+            pwm_obj.stop()
+        self.pwm_objects.clear()
+
+    def setup_button(self, pin):
+        self.buttons.add(pin)
+
+    def watch_button(self, pin, callback, debounce=0.05):
+        self.button_callbacks[pin] = callback
+
+    def press(self, pin):
+        # May be called from any thread, like a GPIO interrupt.
+        if pin in self.pressed:
+            return
+        self.pressed.add(pin)
+        callback = self.button_callbacks.get(pin)
+        if callback is not None:
+            callback(pin)
+
+    def release(self, pin):
+        self.pressed.discard(pin)
+
+    def button_pressed(self, pin):
+        return pin in self.pressed
+
+    def cleanup(self):
+        self.pwm_objects.clear()
+
+    def shutdown(self):
+        self.shutdown_requested = True
+        print("Simulated actuator backend: system shutdown requested.")
+
+
+DRIVING = "driving"
+HOLDING = "holding"
+IDLE = "idle"
+
+
+class Channel:
+    # One servo output. `duty_cycle` is the last commanded duty cycle; a
+    # drive() to the same value is not written again. Holding keeps the
+    # pulses on so the servo holds its position, idle sends 0 % duty so it
+    # goes limp (or, for the conveyor, stops).
+    __slots__ = ("pool", "pin", "pwm", "state", "duty_cycle")
+
+    def __init__(self, pool, pin, pwm):
+        self.pool = pool
+        self.pin = pin
+        self.pwm = pwm
+        self.state = IDLE
+        self.duty_cycle = 0.0
+
+    def drive(self, duty_cycle):
+        # Returns False if the write was elided.
+        if duty_cycle == self.duty_cycle and self.state != IDLE:
+            self.state = DRIVING
+            self.pool.elided += 1
+            return False
+        self.pwm.ChangeDutyCycle(duty_cycle)
+        self.duty_cycle = duty_cycle
+        self.state = DRIVING
+        self.pool.writes += 1
+        return True
+
+    def hold(self):
+        if self.state == DRIVING:
+            self.state = HOLDING
+
+    def idle(self):
+        if self.state != IDLE:
+            self.pwm.ChangeDutyCycle(0)
+            self.pool.writes += 1
+        self.state = IDLE
+        self.duty_cycle = 0.0
+
+
+class ChannelPool:
+    # Long-lived PWM channels, opened once when a server starts instead of
+    # being created and stopped by every method call.
+    def __init__(self, actuators, frequency=50):
+        self.actuators = actuators
+        self.frequency = frequency
+        self.channels = {}
+        self.writes = 0
+        self.elided = 0
+
+    def open(self, pins):
+        for pin in pins:
+            self.channel(pin)
+
+    def channel(self, pin):
+        channel = self.channels.get(pin)
+        if channel is None:
+            channel = Channel(self, pin, self.actuators.pwm(pin, self.frequency))
+            self.channels[pin] = channel
+        return channel
+
+    def idle_all(self):
+        for channel in self.channels.values():
+            channel.idle()
+
+    def close(self):
+        # Stops the PWM outputs; channels are reopened on the next use.
+        self.actuators.stop_all()
+        self.channels.clear()
+
+
+def backend_from_string(spec):
+    spec = spec.strip().lower()
+    if spec == GPIO:
+        return GpioBackend()
+    if spec in (SIMULATED, "simulated"):
+        return SimulatedBackend()
+    raise ValueError(f"Unknown actuator backend {spec!r}, expected gpio or sim.")
+
+
+def backend_from_env(default=GPIO):
+    # OPCUA_ACTUATOR_BACKEND=sim runs the servers without a Raspberry Pi.
+    return backend_from_string(os.environ.get(BACKEND_ENV_VAR) or default)
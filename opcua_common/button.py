@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+
+class ButtonWatcher:
+    # Bridges the falling edge of a push button into the asyncio loop. The
+    # backend calls edge() from its interrupt thread; the press is handed to
+    # the loop with call_soon_threadsafe, so nothing polls the pin. Edges
+    # within `debounce` seconds of the last accepted one are contact bounce.
+    # React to the edge right away where that is harmless, like stopping the
+    # servos, and use confirm() before anything drastic.
+    def __init__(self, actuators, pin, debounce=0.05):
+        self.actuators = actuators
+        self.pin = pin
+        self.debounce = debounce
+        self.loop = None
+        self.presses = None
+        self.last_edge = float("-inf")
+        self.last_latency = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.presses = asyncio.Queue()
+        self.actuators.watch_button(self.pin, self.edge, self.debounce)
+
+    def edge(self, pin=None):
+        now = time.perf_counter()
+        if now - self.last_edge < self.debounce:
+            return
+        self.last_edge = now
+        self.loop.call_soon_threadsafe(self.presses.put_nowait, now)
+
+    async def wait_pressed(self):
+        # Returns the perf_counter() time of the edge.
+        return await self.presses.get()
+
+    async def confirm(self):
+        # True if the button is still held after the debounce time, False
+        # for a glitch or a press that was released again.
+        await asyncio.sleep(self.debounce)
+        return self.actuators.button_pressed(self.pin)
+
+    def reacted(self, edge_time):
+        # Call right after the reaction, e.g. once the servos are stopped.
+        self.last_latency = time.perf_counter() - edge_time
+        return self.last_latency
@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import time
+
+from asyncua import ua
+
+# Lower runs first; commands of equal priority run in submission order.
+STOP = 0
+MOTION = 10
+
+
+class Command:
+    __slots__ = ("name", "factory", "priority", "future", "submitted")
+
+    def __init__(self, name, factory, priority, future):
+        self.name = name
+        self.factory = factory
+        self.priority = priority
+        self.future = future
+        self.submitted = time.perf_counter()
+
+
+class CommandQueue:
+    # Runs actuator commands one at a time, so concurrent method calls from
+    # several clients never interleave servo writes. `factory` is called with
+    # no arguments and returns the coroutine of the command. cancel_all()
+    # drops everything queued and cancels the running command at its next
+    # await, i.e. within one motion step.
+    def __init__(self, server=None):
+        self.server = server
+        self.queue = asyncio.PriorityQueue()
+        self.order = itertools.count()
+        self.current = None
+        self.current_task = None
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.completed = 0
+        self.cancelled = 0
+        self.nodes = None
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    async def add_nodes(self, parent, namespace_id, name="command queue"):
+        queue = await parent.add_object(namespace_id, name)
+        self.nodes = {
+            "depth": await queue.add_variable(namespace_id, "queue depth", 0, ua.VariantType.UInt32),
+            "active": await queue.add_variable(namespace_id, "active command", ""),
+            "last_wait": await queue.add_variable(namespace_id, "last wait ms", 0.0),
+            "max_wait": await queue.add_variable(namespace_id, "max wait ms", 0.0),
+            "completed": await queue.add_variable(namespace_id, "completed commands", 0, ua.VariantType.UInt64),
+            "cancelled": await queue.add_variable(namespace_id, "cancelled commands", 0, ua.VariantType.UInt64),
+        }
+        return queue
+
+    async def publish(self):
+        if self.nodes is None or self.server is None:
+            return
+        values = (
+            ("depth", ua.Variant(self.depth, ua.VariantType.UInt32)),
+            ("active", ua.Variant(self.current.name if self.current else "", ua.VariantType.String)),
+            ("last_wait", ua.Variant(self.last_wait * 1000.0, ua.VariantType.Double)),
+            ("max_wait", ua.Variant(self.max_wait * 1000.0, ua.VariantType.Double)),
+            ("completed", ua.Variant(self.completed, ua.VariantType.UInt64)),
+            ("cancelled", ua.Variant(self.cancelled, ua.VariantType.UInt64)),
+        )
+        for key, variant in values:
+            await self.server.write_attribute_value(self.nodes[key].nodeid, ua.DataValue(variant))
+
+    async def submit(self, name, factory, priority=MOTION):
+        # Returns True once the command has run to completion, False if it
+        # was cancelled or failed.
+        command = Command(name, factory, priority, asyncio.get_running_loop().create_future())
+        self.queue.put_nowait((priority, next(self.order), command))
+        await self.publish()
+        return await command.future
+
+    def cancel_all(self):
+        while not self.queue.empty():
+            _, _, command = self.queue.get_nowait()
+            if not command.future.done():
+                command.future.set_result(False)
+                self.cancelled += 1
+        if self.current_task is not None:
+            self.current_task.cancel()
+
+    async def preempt(self, name, factory):
+        # Stops whatever runs or waits and runs `factory` next.
+        self.cancel_all()
+        return await self.submit(name, factory, STOP)
+
+    async def run(self):
+        while True:
+            _, _, command = await self.queue.get()
+            if command.future.done():
+                continue
+            self.last_wait = time.perf_counter() - command.submitted
+            self.max_wait = max(self.max_wait, self.last_wait)
+            self.current = command
+            self.current_task = task = asyncio.create_task(command.factory())
+            await self.publish()
+            try:
+                await asyncio.wait([task])
+            finally:
+                # Only true when the queue itself is cancelled.
+                task.cancel()
+                self.current = self.current_task = None
+            if task.cancelled():
+                self.cancelled += 1
+                print(f"Command {command.name} cancelled.")
+            elif task.exception() is not None:
+                print(f"Command {command.name} failed: {task.exception()}")
+            else:
+                self.completed += 1
+            if not command.future.done():
+                command.future.set_result(not task.cancelled() and task.exception() is None)
+            await self.publish()
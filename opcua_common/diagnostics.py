@@ -0,0 +1,255 @@
+import asyncio
+import bisect
+import functools
+import inspect
+import os
+import time
+
+from asyncua import ua
+
+DUMP_ENV_VAR = "OPCUA_DIAGNOSTICS_DUMP"
+
+# Upper bucket bounds in milliseconds; the last bucket takes everything slower.
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 60000)
+LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            running += count
+            yield bound, running
+
+
+class MethodStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.nodes = None
+
+    def begin(self):
+        self.calls += 1
+        self.in_flight += 1
+        return time.perf_counter()
+
+    def end(self, started, failed):
+        self.in_flight -= 1
+        if failed:
+            self.errors += 1
+        self.latency.observe((time.perf_counter() - started) * 1000.0)
+
+
+class Diagnostics:
+    # Call counts, in-flight calls and latency histograms of the methods
+    # wrapped with instrument(), event-loop lag and node writes of one server.
+    # run() samples the loop lag every `lag_interval` seconds: how much later
+    # than asked a sleep returns, i.e. how long callbacks hold the loop. Every
+    # `interval` seconds it publishes everything under the "diagnostics"
+    # object and, with `dump_path`, rewrites that file with the same numbers
+    # in Prometheus text format.
+    def __init__(self, server=None, interval=1.0, lag_interval=0.1, dump_path=None):
+        if interval <= 0 or lag_interval <= 0:
+            raise ValueError("Diagnostics intervals must be positive.")
+        self.server = server
+        self.interval = interval
+        self.lag_interval = lag_interval
+        self.dump_path = dump_path
+        self.methods = {}
+        self.loop_lag = Histogram(LAG_BUCKETS_MS)
+        self.counting_writes = False
+        self.writes = 0
+        self.own_writes = 0
+        self.write_rate = 0.0
+        self.nodes = None
+
+    def instrument(self, name, func):
+        # Wraps a method callback, uamethod-decorated or not; asyncua still
+        # awaits coroutine functions and runs plain ones in its thread pool.
+        stats = self.methods.setdefault(name, MethodStats(name))
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args):
+                started = stats.begin()
+                failed = True
+                try:
+                    result = await func(*args)
+                    failed = False
+                    return result
+                finally:
+                    stats.end(started, failed)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args):
+                started = stats.begin()
+                failed = True
+                try:
+                    result = func(*args)
+                    failed = False
+                    return result
+                finally:
+                    stats.end(started, failed)
+        return wrapper
+
+    def count_writes(self, server):
+        # Every write, from a client, a Write service call or
+        # server.write_attribute_value(), ends in the address space.
+        aspace = server.iserver.aspace
+        write_attribute_value = aspace.write_attribute_value
+
+        async def counted_write_attribute_value(nodeid, attr, value):
+            self.writes += 1
+            return await write_attribute_value(nodeid, attr, value)
+
+        aspace.write_attribute_value = counted_write_attribute_value
+        self.counting_writes = True
+
+    @property
+    def node_writes(self):
+        # Writes of the diagnostics nodes themselves are not counted.
+        return self.writes - self.own_writes
+
+    async def add_nodes(self, parent, namespace_id, name="diagnostics"):
+        diagnostics = await parent.add_object(namespace_id, name)
+        await diagnostics.add_property(namespace_id, "latency buckets ms",
+                                       ua.Variant([float(b) for b in LATENCY_BUCKETS_MS], ua.VariantType.Double))
+        await diagnostics.add_property(namespace_id, "lag buckets ms",
+                                       ua.Variant([float(b) for b in LAG_BUCKETS_MS], ua.VariantType.Double))
+        methods = await diagnostics.add_object(namespace_id, "methods")
+        for stats in self.methods.values():
+            method = await methods.add_object(namespace_id, stats.name)
+            stats.nodes = {
+                "calls": await method.add_variable(namespace_id, "calls", 0, ua.VariantType.UInt64),
+                "in_flight": await method.add_variable(namespace_id, "in flight", 0, ua.VariantType.UInt32),
+                "errors": await method.add_variable(namespace_id, "errors", 0, ua.VariantType.UInt64),
+                "mean": await method.add_variable(namespace_id, "mean ms", 0.0),
+                "max": await method.add_variable(namespace_id, "max ms", 0.0),
+                "histogram": await method.add_variable(
+                    namespace_id, "latency histogram",
+                    ua.Variant([0] * len(stats.latency.counts), ua.VariantType.UInt64)),
+            }
+        loop = await diagnostics.add_object(namespace_id, "event loop")
+        writes = await diagnostics.add_object(namespace_id, "node writes")
+        self.nodes = {
+            "lag_last": await loop.add_variable(namespace_id, "lag ms", 0.0),
+            "lag_mean": await loop.add_variable(namespace_id, "mean lag ms", 0.0),
+            "lag_max": await loop.add_variable(namespace_id, "max lag ms", 0.0),
+            "lag_histogram": await loop.add_variable(
+                namespace_id, "lag histogram", ua.Variant([0] * len(self.loop_lag.counts), ua.VariantType.UInt64)),
+            "writes": await writes.add_variable(namespace_id, "writes", 0, ua.VariantType.UInt64),
+            "write_rate": await writes.add_variable(namespace_id, "writes per second", 0.0),
+        }
+        return diagnostics
+
+    async def publish(self):
+        if self.nodes is None or self.server is None:
+            return
+        values = []
+        for stats in self.methods.values():
+            if stats.nodes is None:
+                continue
+            latency = stats.latency
+            values += (
+                (stats.nodes["calls"], ua.Variant(stats.calls, ua.VariantType.UInt64)),
+                (stats.nodes["in_flight"], ua.Variant(stats.in_flight, ua.VariantType.UInt32)),
+                (stats.nodes["errors"], ua.Variant(stats.errors, ua.VariantType.UInt64)),
+                (stats.nodes["mean"], ua.Variant(latency.mean, ua.VariantType.Double)),
+                (stats.nodes["max"], ua.Variant(latency.max, ua.VariantType.Double)),
+                (stats.nodes["histogram"], ua.Variant(list(latency.counts), ua.VariantType.UInt64)),
+            )
+        lag = self.loop_lag
+        values += (
+            (self.nodes["lag_last"], ua.Variant(lag.last, ua.VariantType.Double)),
+            (self.nodes["lag_mean"], ua.Variant(lag.mean, ua.VariantType.Double)),
+            (self.nodes["lag_max"], ua.Variant(lag.max, ua.VariantType.Double)),
+            (self.nodes["lag_histogram"], ua.Variant(list(lag.counts), ua.VariantType.UInt64)),
+            (self.nodes["writes"], ua.Variant(self.node_writes, ua.VariantType.UInt64)),
+            (self.nodes["write_rate"], ua.Variant(self.write_rate, ua.VariantType.Double)),
+        )
+        for node, variant in values:
+            await self.server.write_attribute_value(node.nodeid, ua.DataValue(variant))
+        if self.counting_writes:
+            self.own_writes += len(values)
+
+    def render(self):
+        lines = []
+
+        def histogram(name, labels, values):
+            separator = "," if labels else ""
+            for bound, count in values.cumulative():
+                lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}')
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{braces} {values.total:.3f}")
+            lines.append(f"{name}_count{braces} {values.count}")
+
+        lines.append("# TYPE opcua_method_calls_total counter")
+        for stats in self.methods.values():
+            lines.append(f'opcua_method_calls_total{{method="{stats.name}"}} {stats.calls}')
+        lines.append("# TYPE opcua_method_errors_total counter")
+        for stats in self.methods.values():
+            lines.append(f'opcua_method_errors_total{{method="{stats.name}"}} {stats.errors}')
+        lines.append("# TYPE opcua_method_in_flight gauge")
+        for stats in self.methods.values():
+            lines.append(f'opcua_method_in_flight{{method="{stats.name}"}} {stats.in_flight}')
+        lines.append("# TYPE opcua_method_latency_ms histogram")
+        for stats in self.methods.values():
+            histogram("opcua_method_latency_ms", f'method="{stats.name}"', stats.latency)
+        lines.append("# TYPE opcua_loop_lag_ms histogram")
+        histogram("opcua_loop_lag_ms", "", self.loop_lag)
+        lines.append("# TYPE opcua_loop_lag_max_ms gauge")
+        lines.append(f"opcua_loop_lag_max_ms {self.loop_lag.max:.3f}")
+        lines.append("# TYPE opcua_node_writes_total counter")
+        lines.append(f"opcua_node_writes_total {self.node_writes}")
+        lines.append("# TYPE opcua_node_writes_per_second gauge")
+        lines.append(f"opcua_node_writes_per_second {self.write_rate:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        # Written to a temporary file first, so a reader never sees half a dump.
+        temporary = f"{self.dump_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as dump_file:
+            dump_file.write(self.render())
+        os.replace(temporary, self.dump_path)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last_publish = loop.time()
+        last_writes = self.node_writes
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            now = loop.time()
+            self.loop_lag.observe(max(0.0, now - expected) * 1000.0)
+            if now - last_publish < self.interval:
+                continue
+            self.write_rate = (self.node_writes - last_writes) / (now - last_publish)
+            last_publish, last_writes = now, self.node_writes
+            await self.publish()
+            if self.dump_path:
+                try:
+                    self.dump()
+                except OSError as e:
+                    print(f"Cannot write diagnostics to {self.dump_path}: {e}")
@@ -0,0 +1,114 @@
+import asyncio
+import math
+from datetime import datetime, timezone
+
+from asyncua import ua
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def is_monitored(server, node):
+    # A monitored item registers a datachange callback on the Value attribute
+    # of its node, so an empty callback table means nobody is subscribed.
+    node_data = server.iserver.aspace.get(node.nodeid)
+    if node_data is None:
+        return False
+    return bool(node_data.attributes[ua.AttributeIds.Value].datachange_callbacks)
+
+
+class PeriodicPublisher:
+    # Writes value_factory() to `node` every `interval` seconds, scheduled
+    # against absolute deadlines on the event loop's monotonic clock so write
+    # latency never accumulates into drift. A tick that starts more than one
+    # interval late is an overrun; the missed deadlines are skipped rather
+    # than written in a burst.
+    def __init__(self, server, node, interval, value_factory=utcnow, on_publish=None,
+                 skip_unmonitored=False, stats_every=10):
+        if interval <= 0:
+            raise ValueError("Heartbeat interval must be positive.")
+        self.server = server
+        self.node = node
+        self.interval = interval
+        self.value_factory = value_factory
+        self.on_publish = on_publish
+        self.skip_unmonitored = skip_unmonitored
+        self.stats_every = stats_every
+        self.running = False
+
+        self.ticks = 0
+        self.writes = 0
+        self.skipped_writes = 0
+        self.overruns = 0
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+        self.stats_nodes = None
+
+    @property
+    def mean_jitter(self):
+        return self.total_jitter / self.ticks if self.ticks else 0.0
+
+    async def add_stats_nodes(self, parent, namespace_id, name="heartbeat"):
+        stats = await parent.add_object(namespace_id, name)
+        self.stats_nodes = {
+            "interval": await stats.add_variable(namespace_id, "interval ms", self.interval * 1000.0),
+            "ticks": await stats.add_variable(namespace_id, "ticks", 0, ua.VariantType.UInt64),
+            "skipped": await stats.add_variable(namespace_id, "skipped writes", 0, ua.VariantType.UInt64),
+            "overruns": await stats.add_variable(namespace_id, "overruns", 0, ua.VariantType.UInt64),
+            "max_jitter": await stats.add_variable(namespace_id, "max jitter ms", 0.0),
+            "mean_jitter": await stats.add_variable(namespace_id, "mean jitter ms", 0.0),
+        }
+        return stats
+
+    async def publish_stats(self):
+        if self.stats_nodes is None:
+            return
+        values = (
+            ("ticks", ua.Variant(self.ticks, ua.VariantType.UInt64)),
+            ("skipped", ua.Variant(self.skipped_writes, ua.VariantType.UInt64)),
+            ("overruns", ua.Variant(self.overruns, ua.VariantType.UInt64)),
+            ("max_jitter", ua.Variant(self.max_jitter * 1000.0, ua.VariantType.Double)),
+            ("mean_jitter", ua.Variant(self.mean_jitter * 1000.0, ua.VariantType.Double)),
+        )
+        for key, variant in values:
+            await self.server.write_attribute_value(self.stats_nodes[key].nodeid, ua.DataValue(variant))
+
+    async def tick(self):
+        if self.skip_unmonitored and not is_monitored(self.server, self.node):
+            self.skipped_writes += 1
+            return
+        value = self.value_factory()
+        await self.server.write_attribute_value(self.node.nodeid, ua.DataValue(ua.Variant(value)))
+        self.writes += 1
+        if self.on_publish:
+            self.on_publish(value)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.running = True
+        deadline = loop.time()
+        try:
+            while self.running:
+                jitter = loop.time() - deadline
+                if jitter >= self.interval:
+                    missed = math.floor(jitter / self.interval)
+                    self.overruns += missed
+                    deadline += missed * self.interval
+                    jitter -= missed * self.interval
+                self.ticks += 1
+                self.total_jitter += jitter
+                if jitter > self.max_jitter:
+                    self.max_jitter = jitter
+
+                await self.tick()
+                if self.ticks % self.stats_every == 0:
+                    await self.publish_stats()
+
+                deadline += self.interval
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
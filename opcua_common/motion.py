@@ -0,0 +1,231 @@
+import asyncio
+import json
+import math
+import os
+
+JOINTS_FILE = "joints.json"
+
+
+class Joint:
+    # `speed` is the servo speed in duty-cycle percent per second and `settle`
+    # the time it needs to come to rest after reaching the target. A move
+    # then takes distance / speed + settle. Without a speed, or when the
+    # start position is unknown, a move takes the flat `move_time`.
+    # `ramp_step` splits larger moves into intermediate duty steps of at most
+    # that size, paced at `speed`, instead of one jump.
+    __slots__ = ("name", "pin", "move_time", "speed", "settle", "ramp_step")
+
+    def __init__(self, name, pin, move_time=1.0, speed=None, settle=0.0, ramp_step=None):
+        self.name = name
+        self.pin = pin
+        self.move_time = move_time
+        self.speed = speed
+        self.settle = settle
+        self.ramp_step = ramp_step
+
+    def schedule(self, start, target):
+        # Returns ([(offset, duty cycle), ...], time until the joint is at rest).
+        if start is None or not self.speed:
+            return [(0.0, target)], self.move_time
+        distance = abs(target - start)
+        if distance == 0.0:
+            return [(0.0, target)], 0.0
+        travel = distance / self.speed
+        if not self.ramp_step or distance <= self.ramp_step:
+            return [(0.0, target)], travel + self.settle
+        count = math.ceil(distance / self.ramp_step)
+        delta = target - start
+        steps = [(travel * k / count, start + delta * (k + 1) / count) for k in range(count - 1)]
+        steps.append((travel * (count - 1) / count, target))
+        return steps, travel + self.settle
+
+
+class Waypoint:
+    # `targets` is a tuple of (joint, duty cycle); all of them are commanded
+    # at once. `dwell` adds a pause after the slowest joint has arrived.
+    # `mark` names the phase of the motion that starts with this waypoint.
+    __slots__ = ("targets", "dwell", "mark")
+
+    def __init__(self, targets, dwell=0.0, mark=None):
+        self.targets = targets
+        self.dwell = dwell
+        self.mark = mark
+
+
+class MotionProgram:
+    def __init__(self, name, waypoints, description="", release=True):
+        self.name = name
+        self.waypoints = waypoints
+        self.description = description
+        self.release = release
+
+
+def _number(value, what, path):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{path}: {what} must be a number, got {value!r}")
+    return float(value)
+
+
+def load_joints(path):
+    with open(path, encoding="utf-8") as joints_file:
+        data = json.load(joints_file)
+    joints = {}
+    for name, spec in data.items():
+        if not isinstance(spec, dict) or "pin" not in spec:
+            raise ValueError(f"{path}: joint {name!r} needs a pin")
+        move_time = _number(spec.get("move_time", 1.0), f"move_time of {name}", path)
+        settle = _number(spec.get("settle", 0.0), f"settle of {name}", path)
+        if move_time < 0.0 or settle < 0.0:
+            raise ValueError(f"{path}: move_time and settle of {name} must not be negative")
+        speed = ramp_step = None
+        if "speed" in spec:
+            speed = _number(spec["speed"], f"speed of {name}", path)
+            if speed <= 0.0:
+                raise ValueError(f"{path}: speed of {name} must be positive")
+        if "ramp_step" in spec:
+            ramp_step = _number(spec["ramp_step"], f"ramp_step of {name}", path)
+            if ramp_step <= 0.0 or speed is None:
+                raise ValueError(f"{path}: ramp_step of {name} must be positive and needs a speed")
+        joints[name] = Joint(name, int(spec["pin"]), move_time, speed, settle, ramp_step)
+    return joints
+
+
+def load_motion(path, joints):
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as motion_file:
+        data = json.load(motion_file)
+    waypoints = []
+    for index, spec in enumerate(data.get("waypoints", ()), 1):
+        targets = []
+        for joint_name, duty_cycle in spec.get("joints", {}).items():
+            if joint_name not in joints:
+                raise ValueError(f"{path}: waypoint {index} moves unknown joint {joint_name!r}")
+            duty_cycle = _number(duty_cycle, f"duty cycle of {joint_name} in waypoint {index}", path)
+            if not 0.0 <= duty_cycle <= 100.0:
+                raise ValueError(f"{path}: duty cycle of {joint_name} in waypoint {index} is out of range")
+            targets.append((joints[joint_name], duty_cycle))
+        dwell = _number(spec.get("dwell", 0.0), f"dwell of waypoint {index}", path)
+        mark = spec.get("mark")
+        if mark is not None and not isinstance(mark, str):
+            raise ValueError(f"{path}: mark of waypoint {index} must be a string")
+        waypoints.append(Waypoint(tuple(targets), dwell, mark))
+    if not waypoints:
+        raise ValueError(f"{path}: motion has no waypoints")
+    return MotionProgram(name, waypoints, data.get("description", ""), bool(data.get("release", True)))
+
+
+def load_motions(directory):
+    # joints.json maps joint names to pins; every other *.json file in the
+    # directory is a motion program named after the file.
+    joints = load_joints(os.path.join(directory, JOINTS_FILE))
+    motions = {}
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".json") and file_name != JOINTS_FILE:
+            motion = load_motion(os.path.join(directory, file_name), joints)
+            motions[motion.name] = motion
+    return joints, motions
+
+
+class MotionExecutor:
+    # Moves every joint of a waypoint at once and then waits only as long as
+    # the slowest joint needs for its distance. Joints already at their
+    # target add no wait. `last_run` holds (duty-cycle writes, wait) per
+    # waypoint of the last motion for timing measurements. `on_mark` is
+    # awaited with the mark of every marked waypoint before it starts.
+    # `moves` keeps the last move of every pin as (start duty, target duty,
+    # start time, travel time, time at rest) on the motion clock, so
+    # estimate() can tell where a joint is while it moves. `activity` is set
+    # whenever a waypoint starts or a motion ends.
+    def __init__(self, channels, on_mark=None):
+        self.channels = channels
+        self.on_mark = on_mark
+        self.positions = {}
+        self.moves = {}
+        self.step = 0
+        self.clock = None
+        self.activity = asyncio.Event()
+        self.last_run = []
+
+    def reset(self):
+        # Joint positions are unknown until the next motion commands them.
+        self.positions.clear()
+        self.moves.clear()
+
+    def now(self):
+        return self.clock.now() if self.clock is not None else 0.0
+
+    def estimate(self, pin, now):
+        # Returns (estimated duty cycle, moving).
+        move = self.moves.get(pin)
+        if move is None:
+            return self.positions.get(pin), False
+        start, target, started, travel, at_rest = move
+        elapsed = now - started
+        if elapsed >= travel:
+            return target, now < at_rest
+        return start + (target - start) * elapsed / travel, True
+
+    def busy(self, now):
+        return bool(self.step) or any(now < move[4] for move in self.moves.values())
+
+    async def run(self, program, clock):
+        channels = self.channels
+        positions = self.positions
+        self.clock = clock
+        self.last_run = run = []
+        moved = []
+        try:
+            for index, waypoint in enumerate(program.waypoints, 1):
+                if waypoint.mark and self.on_mark:
+                    await self.on_mark(waypoint.mark)
+                self.step = index
+                now = clock.now()
+                commands = []
+                moved = []
+                wait = 0.0
+                for joint, duty_cycle in waypoint.targets:
+                    start = positions.get(joint.pin)
+                    steps, duration = joint.schedule(start, duty_cycle)
+                    travel = abs(duty_cycle - start) / joint.speed if start is not None and joint.speed else 0.0
+                    self.moves[joint.pin] = (duty_cycle if start is None else start, duty_cycle, now, travel, now + duration)
+                    channel = channels.channel(joint.pin)
+                    commands.extend((offset, channel, duty) for offset, duty in steps)
+                    moved.append((joint.pin, channel, duty_cycle))
+                    wait = max(wait, duration)
+                commands.sort(key=lambda command: command[0])
+                self.activity.set()
+
+                elapsed = 0.0
+                writes = 0
+                for offset, channel, duty in commands:
+                    if offset > elapsed:
+                        await clock.sleep(offset - elapsed)
+                        elapsed = offset
+                    writes += channel.drive(duty)
+                # Positions count only once every write of the move is out.
+                for pin, _, duty_cycle in moved:
+                    positions[pin] = duty_cycle
+                held = [channel for _, channel, _ in moved]
+                moved = []
+                wait += waypoint.dwell
+                run.append((writes, wait))
+                await clock.sleep(wait - elapsed)
+                for channel in held:
+                    channel.hold()
+            if program.release:
+                channels.idle_all()
+        except BaseException:
+            # Interrupted mid-move: a joint is where its last write sent it, or
+            # unknown if it was never driven, so the next move waits the full time.
+            now = clock.now()
+            for pin, channel, _ in moved:
+                if channel.duty_cycle:
+                    positions[pin] = channel.duty_cycle
+                    self.moves[pin] = (channel.duty_cycle, channel.duty_cycle, now, 0.0, now)
+                else:
+                    positions.pop(pin, None)
+                    self.moves.pop(pin, None)
+            raise
+        finally:
+            self.step = 0
+            self.activity.set()
@@ -0,0 +1,133 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+
+from asyncua import ua, uamethod
+
+PROFILE_ENV_VAR = "OPCUA_PROFILE_DIR"
+MAX_SECONDS = 300.0
+TOP_ENTRIES = 15
+TRACEMALLOC_FRAMES = 5
+
+
+class Profiler:
+    # Admin methods that profile the running server for a few seconds:
+    #   profile_loop(seconds): cProfile of everything the event loop runs,
+    #     saved as a .prof file (pstats, snakeviz), top functions by own time.
+    #   trace_memory(seconds): tracemalloc snapshots before and after, the
+    #     second saved as a .tracemalloc file, top allocation growth by line.
+    # Both return (result, file path, summary) and block the calling client's
+    # connection until done. Only one runs at a time. The servers add these
+    # methods only when a profile directory is configured; nothing is hooked
+    # into the loop while no profile runs.
+    def __init__(self, directory, top=TOP_ENTRIES):
+        self.directory = directory
+        self.top = top
+        self.busy = False
+
+    async def add_methods(self, parent, namespace_id):
+        os.makedirs(self.directory, exist_ok=True)
+        seconds_arg = ua.Argument()
+        seconds_arg.Name = "Seconds"
+        seconds_arg.DataType = ua.NodeId(ua.ObjectIds.Double)
+
+        outputs = []
+        for name, data_type in (("Execution Result", ua.ObjectIds.Boolean), ("File Path", ua.ObjectIds.String),
+                                ("Summary", ua.ObjectIds.String)):
+            output = ua.Argument()
+            output.Name = name
+            output.DataType = ua.NodeId(data_type)
+            outputs.append(output)
+
+        await parent.add_method(namespace_id, "profile_loop", self.profile_loop, [seconds_arg], outputs)
+        await parent.add_method(namespace_id, "trace_memory", self.trace_memory, [seconds_arg], outputs)
+
+    def path(self, kind, extension):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(self.directory, f"{kind}-{stamp}.{extension}")
+
+    def check(self, seconds):
+        if self.busy:
+            return "Another profile is running."
+        if not 0 < seconds <= MAX_SECONDS:
+            return f"Seconds must be between 0 and {MAX_SECONDS:g}."
+        return None
+
+    @uamethod
+    async def profile_loop(self, parent, seconds):
+        error = self.check(seconds)
+        if error:
+            return False, "", error
+        self.busy = True
+        profile = cProfile.Profile()
+        try:
+            print(f"Profiling the event loop for {seconds:g} s...")
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+        finally:
+            self.busy = False
+        path = self.path("profile", "prof")
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            return False, "", f"Cannot write {path}: {e}"
+        summary = self.profile_summary(pstats.Stats(profile), seconds)
+        print(f"Profile written to {path}.")
+        return True, path, summary
+
+    def profile_summary(self, stats, seconds):
+        # Time spent in the selector is the loop waiting for work, not load.
+        idle = 0.0
+        entries = []
+        for (filename, line, function), (_, calls, own, total, _) in stats.stats.items():
+            if filename == "~" and "select." in function:
+                idle += own
+            else:
+                entries.append((own, total, calls, filename, line, function))
+        entries.sort(reverse=True)
+        lines = [f"{stats.total_calls} calls in {seconds:g} s, loop idle {idle * 1000:.1f} ms "
+                 f"({idle / seconds * 100:.0f} %), top {self.top} by own time:",
+                 "own ms | total ms | calls | function"]
+        for own, total, calls, filename, line, function in entries[:self.top]:
+            location = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{own * 1000:.1f} | {total * 1000:.1f} | {calls} | {location}({function})")
+        return "\n".join(lines)
+
+    @uamethod
+    async def trace_memory(self, parent, seconds):
+        error = self.check(seconds)
+        if error:
+            return False, "", error
+        self.busy = True
+        started = not tracemalloc.is_tracing()
+        try:
+            print(f"Tracing memory allocations for {seconds:g} s...")
+            if started:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+            self.busy = False
+        path = self.path("memory", "tracemalloc")
+        try:
+            after.dump(path)
+        except OSError as e:
+            return False, "", f"Cannot write {path}: {e}"
+        summary = self.memory_summary(after.compare_to(before, "lineno"), seconds)
+        print(f"Memory snapshot written to {path}.")
+        return True, path, summary
+
+    def memory_summary(self, differences, seconds):
+        growth = sum(difference.size_diff for difference in differences)
+        lines = [f"{growth / 1024:+.1f} KiB traced in {seconds:g} s, top {self.top} by growth:"]
+        lines += [str(difference) for difference in differences[:self.top]]
+        return "\n".join(lines)
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+REALTIME = "realtime"
+SCALED = "scaled"
+FAST = "fast"
+
+CLOCK_ENV_VAR = "OPCUA_SIM_CLOCK"
+
+
+class SimClock:
+    # Virtual time for simulated motion. REALTIME follows the monotonic clock,
+    # SCALED runs it `speed` times faster, FAST advances only when something
+    # sleeps, so a program finishes as fast as the event loop can step it.
+    def __init__(self, mode=REALTIME, speed=1.0):
+        if mode not in (REALTIME, SCALED, FAST):
+            raise ValueError(f"Unknown clock mode: {mode}")
+        if speed <= 0:
+            raise ValueError("Clock speed must be positive.")
+        self.mode = mode
+        self.speed = 1.0 if mode == REALTIME else float(speed)
+        self.start_wall = datetime.now(timezone.utc)
+        self.start_monotonic = time.monotonic()
+        self.virtual = 0.0
+
+    def now(self):
+        if self.mode == FAST:
+            return self.virtual
+        return (time.monotonic() - self.start_monotonic) * self.speed
+
+    def utcnow(self):
+        return self.start_wall + timedelta(seconds=self.now())
+
+    async def sleep(self, seconds):
+        if self.mode == FAST:
+            self.virtual += seconds
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(seconds / self.speed)
+
+    def __repr__(self):
+        if self.mode == SCALED:
+            return f"SimClock({self.speed:g}x)"
+        return f"SimClock({self.mode})"
+
+    @classmethod
+    def from_string(cls, spec):
+        spec = spec.strip().lower()
+        if spec in ("", REALTIME):
+            return cls()
+        if spec == FAST:
+            return cls(FAST)
+        try:
+            speed = float(spec.rstrip("x"))
+        except ValueError:
+            raise ValueError(f"Clock must be '{REALTIME}', '{FAST}' or a speed-up like '10x', got {spec!r}")
+        return cls(SCALED, speed)
+
+    @classmethod
+    def from_env(cls):
+        return cls.from_string(os.environ.get(CLOCK_ENV_VAR, REALTIME))
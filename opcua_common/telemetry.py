@@ -0,0 +1,130 @@
+import asyncio
+
+from asyncua import ua
+
+ABSOLUTE = "absolute"
+PERCENT = "percent"
+
+# Standard hobby servo at 50 Hz: 2.5 % duty is 0 degrees, 12.5 % is 180.
+SERVO_MIN_DUTY = 2.5
+SERVO_MAX_DUTY = 12.5
+SERVO_RANGE_DEG = 180.0
+
+
+def duty_to_angle(duty_cycle):
+    return (duty_cycle - SERVO_MIN_DUTY) / (SERVO_MAX_DUTY - SERVO_MIN_DUTY) * SERVO_RANGE_DEG
+
+
+class JointTelemetry:
+    # Publishes the commanded duty cycle, estimated angle and moving flag of
+    # every joint, plus the active motion step, from a MotionExecutor. While
+    # a motion runs the joints are sampled every `interval` seconds; between
+    # motions the publisher sleeps until the executor signals activity.
+    # A sample is only written if it moved by more than the deadband since
+    # the last written value: `deadband` degrees for ABSOLUTE, or percent
+    # of the servo range for PERCENT. Duty cycles use the same share of
+    # the duty range. The value a joint comes to rest at is always written.
+    # The "telemetry" object counts written and suppressed samples, so the
+    # effect of the deadband can be watched.
+    def __init__(self, server, executor, joints, interval=0.1, deadband=5.0, deadband_type=ABSOLUTE):
+        if interval <= 0:
+            raise ValueError("Telemetry interval must be positive.")
+        if deadband < 0:
+            raise ValueError("Telemetry deadband must not be negative.")
+        if deadband_type == ABSOLUTE:
+            fraction = deadband / SERVO_RANGE_DEG
+        elif deadband_type == PERCENT:
+            fraction = deadband / 100.0
+        else:
+            raise ValueError(f"Unknown deadband type {deadband_type!r}, expected {ABSOLUTE} or {PERCENT}.")
+        self.server = server
+        self.executor = executor
+        self.joints = joints
+        self.interval = interval
+        self.angle_deadband = fraction * SERVO_RANGE_DEG
+        self.duty_deadband = fraction * (SERVO_MAX_DUTY - SERVO_MIN_DUTY)
+        self.nodes = {}
+        self.published = {}
+        self.step_node = None
+        self.claw_node = None
+        self.claw_joint = None
+        self.writes = 0
+        self.suppressed = 0
+        self.stats_nodes = None
+        self.published_stats = None
+
+    async def add_nodes(self, parent, namespace_id, claw_node=None, claw_joint="gripper"):
+        joints = await parent.add_object(namespace_id, "joints")
+        for name, joint in self.joints.items():
+            joint_object = await joints.add_object(namespace_id, name)
+            await joint_object.add_property(namespace_id, "pin", joint.pin)
+            self.nodes[name] = {
+                "duty": await joint_object.add_variable(namespace_id, "commanded duty", 0.0),
+                "angle": await joint_object.add_variable(namespace_id, "estimated angle", 0.0),
+                "moving": await joint_object.add_variable(namespace_id, "moving", False),
+            }
+        self.step_node = await parent.add_variable(namespace_id, "motion step", 0, ua.VariantType.UInt32)
+        stats = await parent.add_object(namespace_id, "telemetry")
+        self.stats_nodes = {
+            "writes": await stats.add_variable(namespace_id, "writes", 0, ua.VariantType.UInt64),
+            "suppressed": await stats.add_variable(namespace_id, "suppressed writes", 0, ua.VariantType.UInt64),
+        }
+        self.claw_node = claw_node
+        self.claw_joint = claw_joint
+        return joints
+
+    async def write(self, key, node, variant, deadband=None):
+        last = self.published.get(key)
+        value = variant.Value
+        if last is not None and (value == last if deadband is None else abs(value - last) <= deadband):
+            self.suppressed += 1
+            return False
+        self.published[key] = value
+        await self.server.write_attribute_value(node.nodeid, ua.DataValue(variant))
+        self.writes += 1
+        return True
+
+    async def publish(self):
+        executor = self.executor
+        now = executor.now()
+        channels = executor.channels.channels
+        for name, joint in self.joints.items():
+            nodes = self.nodes[name]
+            duty, moving = executor.estimate(joint.pin, now)
+            channel = channels.get(joint.pin)
+            commanded = channel.duty_cycle if channel is not None else 0.0
+            # Once at rest, the exact value goes out regardless of the deadband.
+            duty_deadband = self.duty_deadband if moving else None
+            angle_deadband = self.angle_deadband if moving else None
+            await self.write((name, "duty"), nodes["duty"], ua.Variant(commanded, ua.VariantType.Double), duty_deadband)
+            if duty is not None:
+                angle = duty_to_angle(duty)
+                written = await self.write((name, "angle"), nodes["angle"], ua.Variant(angle, ua.VariantType.Double),
+                                           angle_deadband)
+                if written and name == self.claw_joint and self.claw_node is not None:
+                    await self.server.write_attribute_value(self.claw_node.nodeid,
+                                                            ua.DataValue(ua.Variant(angle, ua.VariantType.Double)))
+            await self.write((name, "moving"), nodes["moving"], ua.Variant(moving, ua.VariantType.Boolean))
+        await self.write("step", self.step_node, ua.Variant(executor.step, ua.VariantType.UInt32))
+        await self.publish_stats()
+
+    async def publish_stats(self):
+        # Only written when they changed; these writes are not counted.
+        stats = (self.writes, self.suppressed)
+        if self.stats_nodes is None or stats == self.published_stats:
+            return
+        self.published_stats = stats
+        for key, value in zip(("writes", "suppressed"), stats):
+            await self.server.write_attribute_value(self.stats_nodes[key].nodeid,
+                                                    ua.DataValue(ua.Variant(value, ua.VariantType.UInt64)))
+
+    async def run(self):
+        executor = self.executor
+        while True:
+            busy = executor.busy(executor.now())
+            executor.activity.clear()
+            await self.publish()
+            if busy:
+                await asyncio.sleep(self.interval)
+            else:
+                await executor.activity.wait()
@@ -0,0 +1,27 @@
+from array import array
+
+
+class AxisState:
+    __slots__ = ("names", "position", "velocity", "acceleration")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.position = array("d", [0.0] * len(self.names))
+        self.velocity = array("d", [0.0] * len(self.names))
+        self.acceleration = array("d", [0.0] * len(self.names))
+
+    def set(self, position, velocity, acceleration):
+        self.position[:] = array("d", position)
+        self.velocity[:] = array("d", velocity)
+        self.acceleration[:] = array("d", acceleration)
+
+    def settle(self):
+        for i in range(len(self.names)):
+            self.velocity[i] = 0.0
+            self.acceleration[i] = 0.0
+
+    def reset(self, positions=None):
+        for i in range(len(self.names)):
+            self.position[i] = positions[i] if positions is not None else 0.0
+            self.velocity[i] = 0.0
+            self.acceleration[i] = 0.0
@@ -0,0 +1,100 @@
+from asyncua import ua
+
+from history_store import to_micros
+
+
+class PublishFilter:
+    __slots__ = ("deadband", "min_interval")
+
+    def __init__(self, deadband=0.0, min_interval=0.0):
+        if deadband < 0 or min_interval < 0:
+            raise ValueError("Deadband and minimum publish interval must not be negative.")
+        self.deadband = deadband
+        self.min_interval = min_interval
+
+
+class BlockWriter:
+    # Collects node values with set() and writes them in one Write call per
+    # commit(). A value equal to the one last written to its node is dropped.
+    # Nodes with a PublishFilter also drop changes within their deadband and
+    # hold back values that come less than min_interval seconds (commit
+    # timestamps) after the last write; a held value goes out with a later
+    # commit unless a newer one replaces it. commit(force=True) skips
+    # deadbands and intervals, so the values the axes come to rest at are
+    # always published. With a `history` store every written value is also
+    # recorded there under its source timestamp.
+    def __init__(self, server, history=None):
+        self.session = server.iserver.isession
+        self.history = history
+        self.pending = {}
+        self.held = {}
+        self.filters = {}
+        self.published = {}
+        self.blocks_written = 0
+        self.values_written = 0
+        self.suppressed_unchanged = 0
+        self.suppressed_deadband = 0
+        self.deferred = 0
+
+    @property
+    def suppressed(self):
+        return self.suppressed_unchanged + self.suppressed_deadband + self.deferred
+
+    def set_filter(self, node, deadband=0.0, min_interval=0.0):
+        self.filters[node.nodeid] = PublishFilter(deadband, min_interval)
+
+    def set(self, node, value, varianttype=ua.VariantType.Double):
+        if varianttype == ua.VariantType.Double:
+            value = float(value)
+        self.pending[node.nodeid] = ua.Variant(value, varianttype)
+
+    async def commit(self, timestamp, force=False):
+        if not self.pending:
+            return
+        now = timestamp.timestamp()
+        published = self.published
+        filters = self.filters
+        last_held = self.held
+        held = {}
+        nodes_to_write = []
+        for nodeid, variant in self.pending.items():
+            value = variant.Value
+            last = published.get(nodeid)
+            if last is not None:
+                last_value, last_time = last
+                if value == last_value:
+                    self.suppressed_unchanged += 1
+                    continue
+                publish_filter = filters.get(nodeid)
+                if publish_filter is not None and not force:
+                    if abs(value - last_value) <= publish_filter.deadband:
+                        self.suppressed_deadband += 1
+                        continue
+                    if now - last_time < publish_filter.min_interval:
+                        # Counted once per held value, not once per commit it waits.
+                        if last_held.get(nodeid) is not variant:
+                            self.deferred += 1
+                        held[nodeid] = variant
+                        continue
+            published[nodeid] = (value, now)
+            nodes_to_write.append(ua.WriteValue(
+                NodeId=nodeid,
+                AttributeId=ua.AttributeIds.Value,
+                Value=ua.DataValue(variant, SourceTimestamp=timestamp, ServerTimestamp=timestamp),
+            ))
+        self.held = held
+        self.pending = dict(held)
+        if not nodes_to_write:
+            return
+        params = ua.WriteParameters()
+        params.NodesToWrite = nodes_to_write
+        results = await self.session.write(params)
+        self.blocks_written += 1
+        self.values_written += len(results)
+        history = self.history
+        micros = to_micros(timestamp) if history is not None else None
+        for write_value, status in zip(params.NodesToWrite, results):
+            if not status.is_good():
+                print(f"Write to {write_value.NodeId} failed: {status}")
+            elif history is not None:
+                history.record(write_value.NodeId, micros, write_value.Value.Value.Value)
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+
+from cnc_simulator import OPCUAServer
+from program_cache import DEFAULT_MAX_BLOCKS, ProgramCache
+
+
+def find_free_ports(host, start, count):
+    # Walks up from `start` and keeps every port that can be bound right now,
+    # so a fleet can be started next to servers that already hold some ports.
+    ports = []
+    port = start
+    while len(ports) < count:
+        if port > 65535:
+            raise RuntimeError(f"Not enough free ports above {start} for {count} simulators.")
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            # Same option asyncio's create_server sets, so ports in TIME_WAIT
+            # after a previous run still count as free.
+            probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                probe.bind((host, port))
+                ports.append(port)
+            except OSError:
+                pass
+        port += 1
+    return ports
+
+
+def make_specs(count, host, base_port, prefix):
+    specs = []
+    for i, port in enumerate(find_free_ports(host, base_port, count)):
+        name = f"{prefix}_{i:03d}"
+        specs.append({"name": name, "port": port, "endpoint": f"opc.tcp://{host}:{port}/{name}", "uri": name})
+    return specs
+
+
+async def run_shard(specs, program_dir, cache_blocks):
+    # The program cache bound is per worker, split between its simulators.
+    max_blocks = max(1, cache_blocks // len(specs))
+    simulators = [OPCUAServer(spec["endpoint"], spec["uri"], program_dir=program_dir,
+                              program_cache=ProgramCache(max_blocks=max_blocks)) for spec in specs]
+
+    def stop_all():
+        for simulator in simulators:
+            simulator.server_running = False
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_all)
+    await asyncio.gather(*(simulator.start_server() for simulator in simulators))
+
+
+def worker_main(worker_index, specs, program_dir, cache_blocks):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cores[worker_index % len(cores)]})
+    asyncio.run(run_shard(specs, program_dir, cache_blocks))
+
+
+def start_fleet(specs, workers, program_dir=None, cache_blocks=DEFAULT_MAX_BLOCKS):
+    shards = [specs[i::workers] for i in range(workers)]
+    processes = []
+    for worker_index, shard in enumerate(shards):
+        if not shard:
+            continue
+        process = multiprocessing.Process(target=worker_main, args=(worker_index, shard, program_dir, cache_blocks),
+                                          name=f"cnc-fleet-{worker_index}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_fleet(processes, timeout=10):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fleet of headless CNC simulators.")
+    parser.add_argument("--count", type=int, default=10, help="number of simulated machines")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, one event loop each (default: one per CPU core)")
+    parser.add_argument("--host", default="127.0.0.1", help="address the endpoints bind to")
+    parser.add_argument("--base-port", type=int, default=4840, help="first port to try")
+    parser.add_argument("--prefix", default="cnc_sim", help="endpoint path and namespace URI prefix")
+    parser.add_argument("--program-dir", help="directory served by run_g_code_file")
+    parser.add_argument("--manifest", help="write the endpoint list to this JSON file")
+    parser.add_argument("--cache-blocks", type=int, default=DEFAULT_MAX_BLOCKS,
+                        help="G-code blocks kept in the program caches of one worker, shared out between "
+                             f"its simulators (default: {DEFAULT_MAX_BLOCKS})")
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error("--count must be at least 1")
+    if args.cache_blocks < 1:
+        parser.error("--cache-blocks must be at least 1")
+
+    specs = make_specs(args.count, args.host, args.base_port, args.prefix)
+    workers = max(1, min(args.workers, len(specs)))
+    if args.manifest:
+        with open(args.manifest, "w", encoding="utf-8") as manifest:
+            json.dump(specs, manifest, indent=2)
+
+    processes = start_fleet(specs, workers, args.program_dir, args.cache_blocks)
+    print(f"Started {len(specs)} CNC simulators in {workers} worker processes "
+          f"on ports {specs[0]['port']}-{specs[-1]['port']}.")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping CNC fleet...")
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        stop_fleet(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import tkinter as tk
+import threading
+import asyncio
+from collections import deque
+from datetime import datetime
+from cnc_simulator import OPCUAServer, shorten_message
+
+UPDATE_INTERVAL_MS = 250
+LOG_QUEUE_LIMIT = 1000
+LOG_WIDGET_LINES = 200
+
+class Application(tk.Tk):
+    def __init__(self, endpoint, uri):
+        super().__init__()
+        self.title("OPC UA Server Interface")
+
+
+        bold_font = ('Arial', 12, 'bold')
+        entry_font = ('Arial', 10)
+
+        self.endpoint_label = tk.Label(self, text="Endpoint:", font=bold_font)
+        self.endpoint_label.pack(pady=(10, 0))
+        self.endpoint_entry = tk.Entry(self, width=50, font=entry_font)
+        self.endpoint_entry.pack(pady=(0, 10))
+        self.endpoint_entry.insert(0, endpoint)
+
+        self.uri_label = tk.Label(self, text="URI:", font=bold_font)
+        self.uri_label.pack(pady=(0, 0))
+        self.uri_entry = tk.Entry(self, width=50, font=entry_font)
+        self.uri_entry.pack(pady=(0, 20))
+        self.uri_entry.insert(0, uri)
+        self.default_fg_color = self.endpoint_entry.cget('fg')
+
+
+        self.start_button = tk.Button(self, text="Start Server", command=self.start_server, font=bold_font)
+        self.start_button.pack(pady=(0, 5))
+        self.stop_button = tk.Button(self, text="Stop Server", command=self.stop_server, font=bold_font)
+        self.stop_button.pack(pady=(0, 30))
+
+
+        self.variables_frame = tk.Frame(self)
+        self.variables_frame.pack(pady=(0, 10))
+        self.variables_label = tk.Label(self.variables_frame, text="Realtime Variables", font=bold_font)
+        self.variables_label.pack(pady=(0, 10))
+
+
+        self.variable_labels = {}
+        variable_names = [
+            "x_position_direct", "x_velocity", "x_acceleration",
+            "z_position_direct", "z_velocity", "z_acceleration",
+            "spindle_speed_direct", "feed_rate_direct", "job_state", "current_line",
+            "percent_complete", "server_timestamp"
+        ]
+        for var_name in variable_names:
+            label = tk.Label(self.variables_frame, text=f"{var_name}: N/A", font=entry_font)
+            label.pack(pady=2)
+            self.variable_labels[var_name] = label
+
+
+        self.variable_labels["server_timestamp"].pack_configure(pady=(2, 10))
+
+
+        self.methods_frame = tk.Frame(self)
+        self.methods_frame.pack(pady=(0, 10))
+        self.methods_label = tk.Label(self.methods_frame, text="UA Methods Execution", font=bold_font)
+        self.methods_label.pack(pady=(0, 5))
+
+        self.method_container = tk.Frame(self.methods_frame)
+        self.method_container.pack()
+
+
+        self.method_frames = {}
+        method_names = ["run_gcode", "program_upload", "program_cache", "reference_cnc", "stop_cnc_machine"]
+        for i, method_name in enumerate(method_names):
+            frame = tk.Frame(self.method_container, borderwidth=2, relief="groove")
+            frame.grid(row=0, column=i, padx=5, pady=5)
+
+            label = tk.Label(frame, text=method_name, font=bold_font)
+            label.pack(pady=(5, 5))
+
+            text = tk.Text(frame, height=5, width=30, font=entry_font)
+            text.pack()
+
+            self.method_frames[method_name] = text
+
+        self.server_thread = None
+        self.server_running = False
+        # The server thread only ever assigns dict items and appends to a
+        # bounded deque, both atomic under the GIL; the Tk thread reads them
+        # on its own schedule, so no lock is needed on the hot path.
+        self.shared_data = {}
+        self.rendered_data = {}
+        self.log_queue = deque(maxlen=LOG_QUEUE_LIMIT)
+        self.loop = None
+
+
+        self.update_ui()
+
+    def start_server(self):
+        if not self.server_running:
+            endpoint = self.endpoint_entry.get()
+            uri = self.uri_entry.get()
+            self.server_running = True
+            self.opcua_server = OPCUAServer(endpoint, uri)
+            self.opcua_server.add_observer(self)
+            self.server_thread = threading.Thread(target=self.run_server_thread, daemon=True)
+            self.server_thread.start()
+            print("Server thread started.")
+            self.endpoint_entry.config(fg='green')
+            self.uri_entry.config(fg='green')
+
+    def stop_server(self):
+        if self.server_running:
+            self.server_running = False
+            self.opcua_server.stop()
+            print("Server stopping...")
+            self.endpoint_entry.config(fg=self.default_fg_color)
+            self.uri_entry.config(fg=self.default_fg_color)
+
+    def run_server_thread(self):
+        asyncio.run(self.opcua_server.start_server())
+
+    def update_variable(self, var_name, value):
+        self.shared_data[var_name] = value
+
+    def log_method(self, method_name, message):
+        self.log_queue.append((method_name, shorten_message(message)))
+
+    def update_ui(self):
+        self.update_labels()
+        self.flush_logs()
+        self.after(UPDATE_INTERVAL_MS, self.update_ui)
+
+    def update_labels(self):
+        for var_name, label in self.variable_labels.items():
+            value = self.shared_data.get(var_name, "N/A")
+            if isinstance(value, datetime):
+                value = value.strftime("%Y-%m-%d %H:%M:%S")
+            if self.rendered_data.get(var_name) == value:
+                continue
+            self.rendered_data[var_name] = value
+            label.config(text=f"{var_name}: {value}")
+
+    def flush_logs(self):
+        batches = {}
+        while self.log_queue:
+            method_name, message = self.log_queue.popleft()
+            batches.setdefault(method_name, []).append(message)
+        for method_name, messages in batches.items():
+            text_widget = self.method_frames.get(method_name)
+            if text_widget is None:
+                continue
+            text_widget.insert(tk.END, "\n".join(messages) + "\n")
+            line_count = int(text_widget.index("end-1c").split(".")[0])
+            if line_count > LOG_WIDGET_LINES:
+                text_widget.delete("1.0", f"{line_count - LOG_WIDGET_LINES}.0")
+            text_widget.see(tk.END)
@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cnc_simulator import AXIS_VARIABLES, DEFAULT_PUBLISH_FILTERS, OPCUAServer, shorten_message
+from history_store import DEFAULT_CAPACITY, HistoryStore
+from program_cache import DEFAULT_MAX_BLOCKS, ProgramCache
+from opcua_common.sim_clock import SimClock
+
+DEFAULT_ENDPOINT = "opc.tcp://0.0.0.0:4840/cnc_concept_turn_155_one"
+
+
+class ConsoleObserver:
+    def update_variable(self, var_name, value):
+        pass
+
+    def log_method(self, method_name, message):
+        print(f"[{method_name}] {shorten_message(message)}")
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} must contain a JSON object")
+    return config
+
+
+def setting(value, config, key, default=None):
+    # A command-line value wins even when it is 0, so it can be rejected.
+    return value if value is not None else config.get(key, default)
+
+
+def uri_from_endpoint(endpoint):
+    return urlparse(endpoint).path.strip("/") or "cnc_simulator"
+
+
+async def run(simulator):
+    loop = asyncio.get_running_loop()
+
+    def request_stop():
+        simulator.server_running = False
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, request_stop)
+        except NotImplementedError:
+            pass
+    await simulator.start_server()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one CNC simulator without a GUI.")
+    parser.add_argument("--config", help="JSON file with endpoint, uri, program_dir, clock, heartbeat_interval, "
+                                         "heartbeat_skip_unmonitored, cache_dir, cache_blocks, publish_interval, "
+                                         "publish_filters, history_size, history_db, history_retention, "
+                                         "diagnostics_dump and profile_dir keys")
+    parser.add_argument("--endpoint", help=f"server endpoint (default: {DEFAULT_ENDPOINT})")
+    parser.add_argument("--uri", help="namespace URI (default: last part of the endpoint path)")
+    parser.add_argument("--program-dir", help="directory served by run_g_code_file")
+    parser.add_argument("--clock", help="simulation clock: realtime, fast or a speed-up like 10x")
+    parser.add_argument("--heartbeat-interval", type=float,
+                        help="seconds between server timestamp updates (default: 0.5)")
+    parser.add_argument("--heartbeat-skip-unmonitored", action="store_true",
+                        help="skip heartbeat writes while no client monitors the timestamp")
+    parser.add_argument("--cache-dir", help="persist parsed and planned programs in this directory")
+    parser.add_argument("--cache-blocks", type=int,
+                        help="G-code blocks kept in the program cache, each cached plan counting its "
+                             f"blocks again (default: {DEFAULT_MAX_BLOCKS})")
+    parser.add_argument("--publish-interval", type=float,
+                        help="minimum seconds between two writes of an axis variable (default: 0, every sample)")
+    parser.add_argument("--history-size", type=int,
+                        help=f"historize axis, spindle and feed variables, keeping this many values per variable "
+                             f"in memory (default with --history-db: {DEFAULT_CAPACITY})")
+    parser.add_argument("--history-db", help="also store the history in this SQLite file")
+    parser.add_argument("--history-retention", type=float,
+                        help="seconds of history kept in the SQLite file (default: everything)")
+    parser.add_argument("--diagnostics-dump",
+                        help="rewrite this file every second with the diagnostics in Prometheus text format")
+    parser.add_argument("--profile-dir",
+                        help="add the profile_loop and trace_memory admin methods, saving their files here")
+    parser.add_argument("--quiet", action="store_true", help="do not print method calls")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config) if args.config else {}
+    endpoint = args.endpoint or config.get("endpoint", DEFAULT_ENDPOINT)
+    uri = args.uri or config.get("uri") or uri_from_endpoint(endpoint)
+    clock_spec = args.clock or config.get("clock")
+    try:
+        clock = SimClock.from_string(clock_spec) if clock_spec else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    heartbeat_interval = setting(args.heartbeat_interval, config, "heartbeat_interval", 0.5)
+    if heartbeat_interval <= 0:
+        parser.error("heartbeat interval must be positive")
+
+    cache_blocks = setting(args.cache_blocks, config, "cache_blocks", DEFAULT_MAX_BLOCKS)
+    if cache_blocks < 1:
+        parser.error("cache blocks must be at least 1")
+    program_cache = ProgramCache(max_blocks=cache_blocks, cache_dir=args.cache_dir or config.get("cache_dir"))
+
+    publish_filters = {name: dict(spec) for name, spec in DEFAULT_PUBLISH_FILTERS.items()}
+    for name, spec in config.get("publish_filters", {}).items():
+        publish_filters.setdefault(name, {}).update(spec)
+    publish_interval = setting(args.publish_interval, config, "publish_interval")
+    if publish_interval is not None:
+        if publish_interval < 0:
+            parser.error("publish interval must not be negative")
+        for name in AXIS_VARIABLES:
+            publish_filters.setdefault(name, {})["min_interval"] = publish_interval
+
+    history = None
+    history_size = setting(args.history_size, config, "history_size")
+    history_db = args.history_db or config.get("history_db")
+    if history_size is not None or history_db:
+        try:
+            history = HistoryStore(capacity=DEFAULT_CAPACITY if history_size is None else history_size,
+                                   db_path=history_db,
+                                   retention=setting(args.history_retention, config, "history_retention"))
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        simulator = OPCUAServer(endpoint, uri, program_dir=args.program_dir or config.get("program_dir"), clock=clock,
+                                program_cache=program_cache,
+                                heartbeat_interval=heartbeat_interval,
+                                heartbeat_skip_unmonitored=args.heartbeat_skip_unmonitored
+                                or config.get("heartbeat_skip_unmonitored", False),
+                                publish_filters=publish_filters, history=history,
+                                diagnostics_dump=args.diagnostics_dump or config.get("diagnostics_dump"),
+                                profile_dir=args.profile_dir or config.get("profile_dir"))
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.quiet:
+        simulator.add_observer(ConsoleObserver())
+    asyncio.run(run(simulator))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
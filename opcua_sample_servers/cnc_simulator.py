@@ -0,0 +1,587 @@
+import asyncio
+import os
+import sys
+from asyncua import ua, uamethod, Server
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from opcua_common.diagnostics import Diagnostics
+from opcua_common.heartbeat import PeriodicPublisher
+from opcua_common.profiling import Profiler
+from opcua_common.sim_clock import FAST, SimClock
+from axis_state import AxisState
+from block_writer import BlockWriter
+from gcode_parser import GCodeParseError, GCodeParser, check_program
+from gcode_stream import ProgramUploads, iter_text_lines, resolve_program_path, rewinding_lines
+from history_store import to_micros
+from motion_planner import MotionPlanner
+from program_cache import ProgramCache
+from program_job import COMPLETED, FAILED, IDLE, RUNNING, STOPPED, ProgramJob
+
+AXIS_VARIABLES = ("x position direct", "x velocity", "x acceleration",
+                  "z position direct", "z velocity", "z acceleration")
+FILTERABLE_VARIABLES = AXIS_VARIABLES + ("spindle speed direct", "feed rate direct")
+# Variables a HistoryStore keeps when the simulator is started with one.
+HISTORIZED_VARIABLES = FILTERABLE_VARIABLES
+
+# Observers cut logged messages, which can hold a whole program, to this length.
+LOG_MESSAGE_LENGTH = 200
+
+# Per-variable publish filters by browse name: `deadband` in the variable's
+# unit (mm, mm/s, mm/s^2, rpm, mm/min), `min_interval` in seconds of
+# simulation time. Unchanged values are never written again.
+DEFAULT_PUBLISH_FILTERS = {
+    "x position direct": {"deadband": 0.001},
+    "z position direct": {"deadband": 0.001},
+    "x velocity": {"deadband": 0.01},
+    "z velocity": {"deadband": 0.01},
+    "x acceleration": {"deadband": 0.1},
+    "z acceleration": {"deadband": 0.1},
+}
+
+
+def shorten_message(message):
+    if len(message) > LOG_MESSAGE_LENGTH:
+        return message[:LOG_MESSAGE_LENGTH] + "..."
+    return message
+
+
+class OPCUAServer:
+    def __init__(self, endpoint, uri, program_dir=None, clock=None, planner=None, program_cache=None,
+                 heartbeat_interval=0.5, heartbeat_skip_unmonitored=False, publish_filters=None, history=None,
+                 diagnostics_dump=None, profile_dir=None):
+        self.endpoint = endpoint
+        self.uri = uri
+        self.program_dir = program_dir or os.path.dirname(os.path.abspath(__file__))
+        self.uploads = ProgramUploads()
+        self.observers = []
+        self.server_running = True
+        self.loop = None
+
+        self.clock = clock or SimClock.from_env()
+        self.planner = planner or MotionPlanner()
+        self.program_cache = program_cache if program_cache is not None else ProgramCache()
+        self.axes = AxisState(("x", "z"))
+        self.job = None
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_skip_unmonitored = heartbeat_skip_unmonitored
+        self.history = history
+        self.diagnostics = Diagnostics(dump_path=diagnostics_dump)
+        self.profile_dir = profile_dir
+        self.publish_filters = DEFAULT_PUBLISH_FILTERS if publish_filters is None else publish_filters
+        for name in self.publish_filters:
+            if name not in FILTERABLE_VARIABLES:
+                raise ValueError(f"Unknown publish filter variable {name!r}, expected one of "
+                                 f"{', '.join(FILTERABLE_VARIABLES)}.")
+
+    def add_observer(self, observer):
+        # Observers (the Tk window, a console logger) get update_variable()
+        # and log_method() calls; with none attached the simulator runs headless.
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def update_variable(self, var_name, value):
+        for observer in self.observers:
+            observer.update_variable(var_name, value)
+
+    def log_method(self, method_name, message):
+        for observer in self.observers:
+            observer.log_method(method_name, message)
+
+    async def start_server(self):
+        self.loop = asyncio.get_running_loop()
+        server = Server()
+        await server.init()
+        server.set_endpoint(self.endpoint)
+        namespace_id = await server.register_namespace(self.uri)
+        await self.generate_opc_model(server, namespace_id)
+        self.block_writer = BlockWriter(server)
+        self.apply_publish_filters()
+        if self.history is not None:
+            await self.enable_history(server)
+
+        async with server:
+            print(f"OPC UA Server started at {self.endpoint}")
+            heartbeat_task = asyncio.create_task(self.heartbeat.run())
+            diagnostics_task = asyncio.create_task(self.diagnostics.run())
+            while self.server_running:
+                await asyncio.sleep(0.5)
+                await self.publish_counters(server)
+                if self.history is not None:
+                    self.history.flush()
+            self.heartbeat.stop()
+            heartbeat_task.cancel()
+            diagnostics_task.cancel()
+            print("Server stopping...")
+
+    def stop(self):
+        self.server_running = False
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def generate_opc_model(self, server, namespace_id):
+        cnc_interface = await server.nodes.objects.add_object(namespace_id, "cnc interface")
+
+        cnc_axis_list = await cnc_interface.add_object(namespace_id, "cnc axis list")
+
+        x_axis = await cnc_axis_list.add_object(namespace_id, "x axis")
+        self.x_position_direct = await x_axis.add_variable(namespace_id, "x position direct", 0.0)
+        self.x_velocity = await x_axis.add_variable(namespace_id, "x velocity", 0.0)
+        self.x_acceleration = await x_axis.add_variable(namespace_id, "x acceleration", 0.0)
+
+        z_axis = await cnc_axis_list.add_object(namespace_id, "z axis")
+        self.z_position_direct = await z_axis.add_variable(namespace_id, "z position direct", 0.0)
+        self.z_velocity = await z_axis.add_variable(namespace_id, "z velocity", 0.0)
+        self.z_acceleration = await z_axis.add_variable(namespace_id, "z acceleration", 0.0)
+
+        self.axis_nodes = {
+            "x": (self.x_position_direct, self.x_velocity, self.x_acceleration),
+            "z": (self.z_position_direct, self.z_velocity, self.z_acceleration),
+        }
+
+        cnc_spindle_list = await cnc_interface.add_object(namespace_id, "cnc spindle list")
+        spindle = await cnc_spindle_list.add_object(namespace_id, "spindle")
+        self.spindle_speed_direct = await spindle.add_variable(namespace_id, "spindle speed direct", 0.0)
+
+        cnc_channel_list = await cnc_interface.add_object(namespace_id, "cnc channel list")
+        feed_rate_channel = await cnc_channel_list.add_object(namespace_id, "feed rate channel")
+        self.feed_rate_direct = await feed_rate_channel.add_variable(namespace_id, "feed rate direct", 0.0)
+
+        publishing = await cnc_interface.add_object(namespace_id, "publishing")
+        self.publishing_nodes = {
+            "published": await publishing.add_variable(namespace_id, "published updates", 0, ua.VariantType.UInt64),
+            "unchanged": await publishing.add_variable(namespace_id, "suppressed unchanged", 0, ua.VariantType.UInt64),
+            "deadband": await publishing.add_variable(namespace_id, "suppressed deadband", 0, ua.VariantType.UInt64),
+            "deferred": await publishing.add_variable(namespace_id, "deferred updates", 0, ua.VariantType.UInt64),
+            "suppressed": await publishing.add_variable(namespace_id, "suppressed updates", 0, ua.VariantType.UInt64),
+        }
+        self.filterable_nodes = {
+            "x position direct": self.x_position_direct, "x velocity": self.x_velocity,
+            "x acceleration": self.x_acceleration, "z position direct": self.z_position_direct,
+            "z velocity": self.z_velocity, "z acceleration": self.z_acceleration,
+            "spindle speed direct": self.spindle_speed_direct, "feed rate direct": self.feed_rate_direct,
+        }
+
+        timestamp_channel = await cnc_channel_list.add_object(namespace_id, "timestamp channel")
+        self.mydtvar = await timestamp_channel.add_variable(namespace_id, "server timestamp", datetime.now(timezone.utc))
+        self.heartbeat = PeriodicPublisher(
+            server, self.mydtvar, self.heartbeat_interval,
+            on_publish=lambda value: self.update_variable("server_timestamp", value),
+            skip_unmonitored=self.heartbeat_skip_unmonitored)
+        await self.heartbeat.add_stats_nodes(timestamp_channel, namespace_id)
+
+        g_functions_channel = await cnc_channel_list.add_object(namespace_id, "g function channel")
+        # Method callbacks are wrapped for the call counts and latencies under "diagnostics".
+        instrument = self.diagnostics.instrument
+
+        run_gcode_arg = ua.Argument()
+        run_gcode_arg.Name = "G-Code Command"
+        run_gcode_arg.DataType = ua.NodeId(ua.ObjectIds.String)
+
+        method_true_output = ua.Argument()
+        method_true_output.Name = "Execution Result"
+        method_true_output.DataType = ua.NodeId(ua.ObjectIds.Boolean)
+
+        job_id_output = ua.Argument()
+        job_id_output.Name = "Job Id"
+        job_id_output.DataType = ua.NodeId(ua.ObjectIds.UInt32)
+
+        await g_functions_channel.add_method(namespace_id, "run_g_code", instrument("run_g_code", self.run_gcode), [run_gcode_arg], [method_true_output, job_id_output])
+
+        chunk_arg = ua.Argument()
+        chunk_arg.Name = "G-Code Chunk"
+        chunk_arg.DataType = ua.NodeId(ua.ObjectIds.String)
+
+        path_arg = ua.Argument()
+        path_arg.Name = "Program Path"
+        path_arg.DataType = ua.NodeId(ua.ObjectIds.String)
+
+        # begin_program returns an upload id that append_chunk and
+        # commit_program take, so several clients can upload at once.
+        upload_id_arg = ua.Argument()
+        upload_id_arg.Name = "Upload Id"
+        upload_id_arg.DataType = ua.NodeId(ua.ObjectIds.UInt32)
+
+        await g_functions_channel.add_method(namespace_id, "begin_program", instrument("begin_program", self.begin_program), [], [method_true_output, upload_id_arg])
+        await g_functions_channel.add_method(namespace_id, "append_chunk", instrument("append_chunk", self.append_chunk), [upload_id_arg, chunk_arg], [method_true_output])
+        await g_functions_channel.add_method(namespace_id, "commit_program", instrument("commit_program", self.commit_program), [upload_id_arg], [method_true_output, job_id_output])
+        await g_functions_channel.add_method(namespace_id, "run_g_code_file", instrument("run_g_code_file", self.run_gcode_file), [path_arg], [method_true_output, job_id_output])
+
+        name_arg = ua.Argument()
+        name_arg.Name = "Program Name"
+        name_arg.DataType = ua.NodeId(ua.ObjectIds.String)
+
+        reference_arg = ua.Argument()
+        reference_arg.Name = "Program Name or Hash"
+        reference_arg.DataType = ua.NodeId(ua.ObjectIds.String)
+
+        hash_output = ua.Argument()
+        hash_output.Name = "Program Hash"
+        hash_output.DataType = ua.NodeId(ua.ObjectIds.String)
+
+        await g_functions_channel.add_method(namespace_id, "preload_program", instrument("preload_program", self.preload_program), [name_arg, run_gcode_arg], [method_true_output, hash_output])
+        await g_functions_channel.add_method(namespace_id, "run_program", instrument("run_program", self.run_program), [reference_arg], [method_true_output, job_id_output])
+
+        program_cache = await g_functions_channel.add_object(namespace_id, "program cache")
+        self.cached_programs_node = await program_cache.add_variable(namespace_id, "cached programs", 0, ua.VariantType.UInt32)
+        self.cached_blocks_node = await program_cache.add_variable(namespace_id, "cached blocks", 0, ua.VariantType.UInt32)
+        self.cache_hits_node = await program_cache.add_variable(namespace_id, "hits", 0, ua.VariantType.UInt64)
+        self.cache_misses_node = await program_cache.add_variable(namespace_id, "misses", 0, ua.VariantType.UInt64)
+
+        program_job = await g_functions_channel.add_object(namespace_id, "program job")
+        self.job_id_node = await program_job.add_variable(namespace_id, "job id", 0, ua.VariantType.UInt32)
+        self.job_state_node = await program_job.add_variable(namespace_id, "job state", IDLE)
+        self.current_line_node = await program_job.add_variable(namespace_id, "current line", 0, ua.VariantType.Int32)
+        self.percent_complete_node = await program_job.add_variable(namespace_id, "percent complete", 0.0)
+
+        await cnc_channel_list.add_method(namespace_id, "reference_cnc_machine", instrument("reference_cnc_machine", self.reference_cnc), [], [method_true_output])
+        await cnc_channel_list.add_method(namespace_id, "stop_cnc_machine", instrument("stop_cnc_machine", self.stop_cnc_machine), [], [method_true_output])
+
+        self.diagnostics.server = server
+        self.diagnostics.count_writes(server)
+        diagnostics = await self.diagnostics.add_nodes(cnc_interface, namespace_id)
+        if self.profile_dir:
+            await Profiler(self.profile_dir).add_methods(diagnostics, namespace_id)
+
+    @uamethod
+    async def run_gcode(self, parent, gcode_str):
+        self.log_method("run_gcode", f"Method called with argument: {gcode_str}")
+        if not isinstance(gcode_str, str):
+            print("G-code must be a string.")
+            self.log_method("run_gcode", "G-code must be a string.")
+            return False, self.job_id_variant(0)
+
+        if not self.program_cache.fits(gcode_str):
+            # Too large to cache next to a plan: parsed and planned block by block.
+            self.log_method("run_gcode", "Program too large for the program cache, streaming it.")
+            return await self.start_program("run_gcode", lambda: iter_text_lines(gcode_str))
+        program = await self.compile_program("run_gcode", gcode_str)
+        if program is None:
+            return False, self.job_id_variant(0)
+        return await self.start_cached_program("run_gcode", program)
+
+    @uamethod
+    async def preload_program(self, parent, name, gcode_str):
+        self.log_method("program_cache", f"preload_program called for {name!r}")
+        if not isinstance(name, str) or not name or not isinstance(gcode_str, str):
+            self.log_method("program_cache", "Program name and G-code must be non-empty strings.")
+            return False, ""
+        if not self.program_cache.fits(gcode_str):
+            self.log_method("program_cache", f"Program {name!r} is too large for the program cache, "
+                                             "send it with run_g_code or upload it instead.")
+            return False, ""
+        program = await self.compile_program("program_cache", gcode_str, name)
+        if program is None:
+            return False, ""
+        if self.job is None or not self.job.running:
+            # Plan now from the idle position so run_program can start at once.
+            await self.program_cache.plan_async(program, self.planner, self.axes.position)
+        self.publish_cache()
+        await self.block_writer.commit(self.clock.utcnow())
+        self.log_method("program_cache", f"Program {name!r} loaded, {program.block_count} blocks, hash {program.key}.")
+        return True, program.key
+
+    @uamethod
+    async def run_program(self, parent, reference):
+        self.log_method("program_cache", f"run_program called with: {reference}")
+        program = await self.program_cache.lookup_async(reference) if isinstance(reference, str) else None
+        if program is None:
+            self.log_method("program_cache", f"Program {reference!r} is not loaded, preload it first.")
+            return False, self.job_id_variant(0)
+        return await self.start_cached_program("program_cache", program)
+
+    async def compile_program(self, method_name, gcode_str, name=None):
+        try:
+            if name is None:
+                return await self.program_cache.compile_async(gcode_str)
+            return await self.program_cache.preload_async(name, gcode_str)
+        except GCodeParseError as e:
+            print(f"G-code parse error: {e}")
+            self.log_method(method_name, f"G-code parse error: {e}")
+            return None
+
+    @uamethod
+    async def begin_program(self, parent):
+        upload_id = self.uploads.begin()
+        self.log_method("program_upload", f"Program upload {upload_id} started.")
+        return True, ua.Variant(upload_id, ua.VariantType.UInt32)
+
+    @uamethod
+    async def append_chunk(self, parent, upload_id, chunk):
+        if not isinstance(chunk, str):
+            self.log_method("program_upload", "G-code chunk must be a string.")
+            return False
+        try:
+            self.uploads.get(upload_id).append(chunk)
+        except RuntimeError as e:
+            self.log_method("program_upload", str(e))
+            return False
+        return True
+
+    @uamethod
+    async def commit_program(self, parent, upload_id):
+        try:
+            upload = self.uploads.get(upload_id)
+        except RuntimeError as e:
+            self.log_method("program_upload", str(e))
+            return False, self.job_id_variant(0)
+        self.log_method("program_upload", f"Committing upload {upload_id}, {upload.chunks} chunks, {upload.size} characters.")
+        program_file = self.uploads.commit(upload_id)
+        return await self.start_program("program_upload", rewinding_lines(program_file), program_file.close)
+
+    @uamethod
+    async def run_gcode_file(self, parent, path):
+        self.log_method("program_upload", f"run_g_code_file called with path: {path}")
+        try:
+            program_file = open(resolve_program_path(path, self.program_dir), encoding="utf-8")
+        except (OSError, ValueError) as e:
+            print(f"Cannot open G-code program: {e}")
+            self.log_method("program_upload", f"Cannot open G-code program: {e}")
+            return False, self.job_id_variant(0)
+        return await self.start_program("program_upload", rewinding_lines(program_file), program_file.close)
+
+    def job_id_variant(self, job_id):
+        return ua.Variant(job_id, ua.VariantType.UInt32)
+
+    def job_busy(self, method_name):
+        if self.job is not None and self.job.running:
+            self.log_method(method_name, f"Job {self.job.job_id} is still running, stop it first.")
+            return True
+        return False
+
+    async def start_program(self, method_name, open_lines, on_done=None):
+        # Validates the program in the thread pool, so a long file does not
+        # hold the event loop, then runs it as a background task and returns
+        # (accepted, job id) straight away; progress is published on the
+        # "program job" nodes and stop_cnc_machine cancels the task.
+        if self.job_busy(method_name):
+            if on_done:
+                on_done()
+            return False, self.job_id_variant(0)
+        try:
+            block_count = await asyncio.get_running_loop().run_in_executor(None, check_program, open_lines())
+        except GCodeParseError as e:
+            print(f"G-code parse error: {e}")
+            self.log_method(method_name, f"G-code parse error: {e}")
+            if on_done:
+                on_done()
+            return False, self.job_id_variant(0)
+        # Another job may have started while the program was checked.
+        if self.job_busy(method_name):
+            if on_done:
+                on_done()
+            return False, self.job_id_variant(0)
+
+        return self.launch_job(method_name, block_count, GCodeParser().iter_blocks(open_lines()), on_done=on_done)
+
+    async def start_cached_program(self, method_name, program):
+        # Cached programs skip validation and, when they start from a position
+        # they were planned for, planning too. A new plan is computed in the
+        # thread pool; if the axes or modes changed meanwhile, the job plans
+        # as it goes.
+        if self.job_busy(method_name):
+            return False, self.job_id_variant(0)
+        start = tuple(self.axes.position)
+        plan_key = program.plan_key(self.planner, start)
+        plans = await self.program_cache.plan_async(program, self.planner, start)
+        if self.job_busy(method_name):
+            return False, self.job_id_variant(0)
+        if program.plan_key(self.planner, self.axes.position) != plan_key:
+            plans = None
+        self.publish_cache()
+        return self.launch_job(method_name, program.block_count, program.blocks, plans)
+
+    def launch_job(self, method_name, block_count, blocks, plans=None, on_done=None):
+        job = ProgramJob(method_name, block_count)
+        self.job = job
+        job.task = asyncio.create_task(self.run_job(job, blocks, plans, on_done))
+        job.task.add_done_callback(lambda task: self.job_done(job, on_done))
+        self.log_method(method_name, f"Job {job.job_id} started, {block_count} blocks.")
+        return True, self.job_id_variant(job.job_id)
+
+    def job_done(self, job, on_done):
+        # A task cancelled before its first step never enters run_job(), so
+        # the job would stay running and block every later program.
+        if job.state != RUNNING:
+            return
+        job.state = STOPPED
+        if on_done:
+            on_done()
+        self.publish_job(job)
+        print(f"G-code job {job.job_id} stopped before it started.")
+        self.log_method(job.method_name, f"Job {job.job_id} stopped before it started.")
+
+    async def run_job(self, job, blocks, plans, on_done):
+        self.publish_job(job)
+        try:
+            await self.execute_blocks(job, blocks, plans)
+            job.state = COMPLETED
+            print("G-code execution completed.")
+            self.log_method(job.method_name, f"Job {job.job_id} executed successfully.")
+        except asyncio.CancelledError:
+            job.state = STOPPED
+            print(f"G-code job {job.job_id} stopped at line {job.current_line}.")
+            self.log_method(job.method_name, f"Job {job.job_id} stopped at line {job.current_line}.")
+            raise
+        except Exception as e:
+            job.state = FAILED
+            print(f"G-code job {job.job_id} failed: {e}")
+            self.log_method(job.method_name, f"Job {job.job_id} failed at line {job.current_line}: {e}")
+        finally:
+            if on_done:
+                on_done()
+            self.axes.settle()
+            self.publish_axes(self.block_writer)
+            self.publish_job(job)
+            await self.block_writer.commit(self.clock.utcnow(), force=True)
+
+    async def execute_blocks(self, job, blocks, plans=None):
+        # `plans` holds one planned trajectory (or None) per block of a cached
+        # program; streamed programs are planned block by block.
+        writer = self.block_writer
+        planner = self.planner
+        self.axes.settle()
+        for index, block in enumerate(blocks):
+            job.current_line = block.line_number
+            self.publish_job(job)
+            planner.update_modes(block)
+
+            if block.s is not None:
+                spindle_speed = block.s
+                writer.set(self.spindle_speed_direct, spindle_speed)
+                self.update_variable("spindle_speed_direct", spindle_speed)
+
+            if block.f is not None:
+                feed_rate = block.f
+                writer.set(self.feed_rate_direct, feed_rate)
+                self.update_variable("feed_rate_direct", feed_rate)
+
+            if plans is None:
+                trajectory = planner.plan(block, self.axes.position, (block.x, block.z))
+            else:
+                trajectory = plans[index]
+            if trajectory is None:
+                await self.clock.sleep(planner.dwell_time(block))
+                await writer.commit(self.clock.utcnow())
+            else:
+                await self.run_trajectory(trajectory)
+            job.blocks_done += 1
+
+    def apply_publish_filters(self):
+        for name, spec in self.publish_filters.items():
+            self.block_writer.set_filter(self.filterable_nodes[name], spec.get("deadband", 0.0),
+                                         spec.get("min_interval", 0.0))
+
+    async def enable_history(self, server):
+        # Values reach the store through the block writer, not through an
+        # internal subscription, so none are lost between two publish cycles.
+        history = self.history
+        server.iserver.history_manager.set_storage(history)
+        await history.init()
+        now = to_micros(self.clock.utcnow())
+        for name in HISTORIZED_VARIABLES:
+            node = self.filterable_nodes[name]
+            await node.write_attribute(ua.AttributeIds.Historizing, ua.DataValue(True))
+            await node.set_attr_bit(ua.AttributeIds.AccessLevel, ua.AccessLevel.HistoryRead)
+            await node.set_attr_bit(ua.AttributeIds.UserAccessLevel, ua.AccessLevel.HistoryRead)
+            await history.new_historized_node(node.nodeid, None)
+            history.record(node.nodeid, now, await node.read_value())
+        self.block_writer.history = history
+
+    async def publish_counters(self, server):
+        writer = self.block_writer
+        values = (
+            ("published", writer.values_written),
+            ("unchanged", writer.suppressed_unchanged),
+            ("deadband", writer.suppressed_deadband),
+            ("deferred", writer.deferred),
+            ("suppressed", writer.suppressed),
+        )
+        for key, value in values:
+            await server.write_attribute_value(self.publishing_nodes[key].nodeid,
+                                               ua.DataValue(ua.Variant(value, ua.VariantType.UInt64)))
+
+    def publish_job(self, job):
+        writer = self.block_writer
+        writer.set(self.job_id_node, job.job_id, ua.VariantType.UInt32)
+        writer.set(self.job_state_node, job.state, ua.VariantType.String)
+        writer.set(self.current_line_node, job.current_line, ua.VariantType.Int32)
+        writer.set(self.percent_complete_node, job.percent)
+        self.update_variable("job_state", f"{job.job_id} {job.state}")
+        self.update_variable("current_line", job.current_line)
+        self.update_variable("percent_complete", round(job.percent, 1))
+
+    def publish_cache(self):
+        cache = self.program_cache
+        writer = self.block_writer
+        writer.set(self.cached_programs_node, len(cache), ua.VariantType.UInt32)
+        writer.set(self.cached_blocks_node, cache.blocks, ua.VariantType.UInt32)
+        writer.set(self.cache_hits_node, cache.hits, ua.VariantType.UInt64)
+        writer.set(self.cache_misses_node, cache.misses, ua.VariantType.UInt64)
+
+    async def run_trajectory(self, trajectory):
+        writer = self.block_writer
+        if self.clock.mode == FAST:
+            # Nobody watches the samples of a move that takes no real time:
+            # the clock jumps to its end and only the end state is published.
+            t, position, velocity, acceleration = trajectory.last_sample()
+            await self.clock.sleep(t)
+            self.axes.set(position, velocity, acceleration)
+            self.publish_axes(writer)
+            await writer.commit(self.clock.utcnow())
+            return
+        elapsed = 0.0
+        for times, positions, velocities, accelerations in trajectory.chunks():
+            for t, position, velocity, acceleration in zip(
+                    times.tolist(), positions.tolist(), velocities.tolist(), accelerations.tolist()):
+                await self.clock.sleep(t - elapsed)
+                elapsed = t
+                current_time = self.clock.utcnow()
+                self.axes.set(position, velocity, acceleration)
+                self.publish_axes(writer)
+                await writer.commit(current_time)
+
+    def publish_axes(self, writer):
+        axes = self.axes
+        for i, name in enumerate(axes.names):
+            position_node, velocity_node, acceleration_node = self.axis_nodes[name]
+            writer.set(position_node, axes.position[i])
+            writer.set(velocity_node, axes.velocity[i])
+            writer.set(acceleration_node, axes.acceleration[i])
+            self.update_variable(f"{name}_position_direct", axes.position[i])
+            self.update_variable(f"{name}_velocity", axes.velocity[i])
+            self.update_variable(f"{name}_acceleration", axes.acceleration[i])
+
+    @uamethod
+    async def reference_cnc(self, parent):
+        self.log_method("reference_cnc", "Method called")
+        if self.job is not None and self.job.running:
+            self.log_method("reference_cnc", f"Job {self.job.job_id} is running, stop it first.")
+            return False
+        print("Starting CNC referencing...")
+
+        self.axes.reset()
+        self.publish_axes(self.block_writer)
+        await self.block_writer.commit(self.clock.utcnow(), force=True)
+        await self.clock.sleep(3)
+
+        print("CNC referencing completed.")
+        self.log_method("reference_cnc", "Method executed successfully.")
+        return True
+
+    @uamethod
+    async def stop_cnc_machine(self, parent):
+        self.log_method("stop_cnc_machine", "Method called")
+        job = self.job
+        if job is not None and job.running:
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+            await self.block_writer.commit(self.clock.utcnow())
+        print("CNC stopped....")
+        self.log_method("stop_cnc_machine", "Method executed successfully.")
+        return True
@@ -0,0 +1,155 @@
+import re
+
+# One alternation scanned left to right: comment, word, or a stray character
+# that makes the block invalid. Every line is consumed by a single findall().
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        \(([^)]*)\)                                 # (comment)
+      | ;(.*)                                       # ; comment to end of line
+      | ([A-Za-z])\s*([-+]?(?:\d+\.?\d*|\.\d+))     # address word
+      | (\S)                                        # anything else is an error
+    )""", re.VERBOSE)
+
+MOTION_CODES = (0.0, 1.0, 2.0, 3.0)
+RAPID = 0
+LINEAR = 1
+CW_ARC = 2
+CCW_ARC = 3
+
+class GCodeParseError(ValueError):
+    def __init__(self, line_number, message, text=""):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+        self.message = message
+        self.text = text
+
+
+class Block:
+    __slots__ = ("line_number", "n", "motion", "g_codes", "x", "z", "i", "k",
+                 "s", "f", "t", "m_codes", "words", "comment")
+
+    def __init__(self, line_number, n=None, motion=None, g_codes=(), x=None, z=None, i=None, k=None,
+                 s=None, f=None, t=None, m_codes=(), words=(), comment=None):
+        self.line_number = line_number
+        self.n = n
+        self.motion = motion
+        self.g_codes = g_codes
+        self.x = x
+        self.z = z
+        self.i = i
+        self.k = k
+        self.s = s
+        self.f = f
+        self.t = t
+        self.m_codes = m_codes
+        self.words = words
+        self.comment = comment
+
+    @property
+    def has_motion(self):
+        # G04 borrows the X word for its dwell time.
+        return self.motion is not None and (self.x is not None or self.z is not None) \
+            and 4.0 not in self.g_codes
+
+    # A plain tuple pickles and loads much faster than the default slot dict.
+    def __getstate__(self):
+        return (self.line_number, self.n, self.motion, self.g_codes, self.x, self.z, self.i, self.k,
+                self.s, self.f, self.t, self.m_codes, self.words, self.comment)
+
+    def __setstate__(self, state):
+        (self.line_number, self.n, self.motion, self.g_codes, self.x, self.z, self.i, self.k,
+         self.s, self.f, self.t, self.m_codes, self.words, self.comment) = state
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__
+                           if getattr(self, name) not in (None, ()))
+        return f"Block({fields})"
+
+
+class GCodeParser:
+    def __init__(self):
+        self.motion = None
+
+    def parse_line(self, text, line_number):
+        line = text.strip()
+        if not line or line == "%":
+            return None
+        if line[0] == "/":
+            line = line[1:]
+
+        n = motion = x = z = i = k = s = f = t = comment = None
+        g_codes = m_codes = words = ()
+        has_words = False
+
+        for paren_comment, eol_comment, letter, value, stray in _TOKEN_RE.findall(line):
+            if letter:
+                has_words = True
+                if letter > "Z":
+                    letter = letter.upper()
+                if letter == "X":
+                    if x is not None:
+                        raise GCodeParseError(line_number, "duplicate X word", text)
+                    x = float(value)
+                elif letter == "Z":
+                    if z is not None:
+                        raise GCodeParseError(line_number, "duplicate Z word", text)
+                    z = float(value)
+                elif letter == "G":
+                    number = float(value)
+                    if number in MOTION_CODES:
+                        if motion is not None:
+                            raise GCodeParseError(line_number, "more than one motion code in block", text)
+                        motion = int(number)
+                    else:
+                        g_codes += (number,)
+                elif letter == "F":
+                    f = float(value)
+                elif letter == "S":
+                    s = float(value)
+                elif letter == "M":
+                    m_codes += (int(float(value)),)
+                elif letter == "T":
+                    t = int(float(value))
+                elif letter == "N":
+                    n = int(float(value))
+                elif letter == "I":
+                    if i is not None:
+                        raise GCodeParseError(line_number, "duplicate I word", text)
+                    i = float(value)
+                elif letter == "K":
+                    if k is not None:
+                        raise GCodeParseError(line_number, "duplicate K word", text)
+                    k = float(value)
+                else:
+                    words += ((letter, float(value)),)
+            elif stray:
+                if stray == "(":
+                    raise GCodeParseError(line_number, "unterminated comment", text)
+                if stray.isalpha():
+                    raise GCodeParseError(line_number, f"word {stray.upper()} has no value", text)
+                raise GCodeParseError(line_number, f"unexpected character {stray!r}", text)
+            else:
+                part = (paren_comment or eol_comment).strip()
+                comment = part if comment is None else f"{comment}; {part}"
+
+        if not has_words:
+            return None
+        if motion is None:
+            motion = self.motion
+        else:
+            self.motion = motion
+        return Block(line_number, n, motion, g_codes, x, z, i, k, s, f, t, m_codes, words, comment)
+
+    def iter_blocks(self, lines, start=1):
+        parse_line = self.parse_line
+        for line_number, text in enumerate(lines, start):
+            block = parse_line(text, line_number)
+            if block is not None:
+                yield block
+
+
+def check_program(lines):
+    count = 0
+    for _ in GCodeParser().iter_blocks(lines):
+        count += 1
+    return count
@@ -0,0 +1,110 @@
+import itertools
+import os
+import tempfile
+from collections import OrderedDict
+
+# Open uploads kept per simulator; beginning another drops the oldest.
+MAX_UPLOADS = 16
+
+
+def iter_text_lines(text):
+    # Lazy replacement for text.split('\n'): yields one slice at a time
+    # instead of materialising a list of every line in the program.
+    find = text.find
+    start = 0
+    while True:
+        end = find("\n", start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+class ProgramUpload:
+    def __init__(self, spool_dir=None):
+        self.spool_dir = spool_dir
+        self.file = None
+        self.size = 0
+        self.chunks = 0
+
+    @property
+    def active(self):
+        return self.file is not None
+
+    def begin(self):
+        self.discard()
+        self.file = tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="", dir=self.spool_dir)
+
+    def append(self, chunk):
+        if self.file is None:
+            raise RuntimeError("No program upload in progress, call begin_program first.")
+        self.file.write(chunk)
+        self.size += len(chunk)
+        self.chunks += 1
+
+    def commit(self):
+        if self.file is None:
+            raise RuntimeError("No program upload in progress, call begin_program first.")
+        program_file = self.file
+        self.file = None
+        self.size = 0
+        self.chunks = 0
+        program_file.flush()
+        return program_file
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+        self.file = None
+        self.size = 0
+        self.chunks = 0
+
+
+class ProgramUploads:
+    # Concurrent uploads, one per begin(), each spooled to its own file and
+    # addressed by the id begin() returns, so clients do not share a spool.
+    def __init__(self, spool_dir=None, max_uploads=MAX_UPLOADS):
+        self.spool_dir = spool_dir
+        self.max_uploads = max_uploads
+        self.uploads = OrderedDict()
+        self.ids = itertools.count(1)
+
+    def begin(self):
+        upload = ProgramUpload(self.spool_dir)
+        upload.begin()
+        upload_id = next(self.ids)
+        self.uploads[upload_id] = upload
+        while len(self.uploads) > self.max_uploads:
+            _, oldest = self.uploads.popitem(last=False)
+            oldest.discard()
+        return upload_id
+
+    def get(self, upload_id):
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise RuntimeError(f"No program upload {upload_id} in progress, call begin_program first.")
+        return upload
+
+    def commit(self, upload_id):
+        upload = self.get(upload_id)
+        del self.uploads[upload_id]
+        return upload.commit()
+
+
+def resolve_program_path(path, program_dir):
+    base = os.path.realpath(program_dir)
+    full_path = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, full_path]) != base:
+        raise ValueError(f"{path} is outside the program directory {base}")
+    if not os.path.isfile(full_path):
+        raise FileNotFoundError(f"No such G-code program: {path}")
+    return full_path
+
+
+def rewinding_lines(program_file):
+    def open_lines():
+        program_file.seek(0)
+        return program_file
+    return open_lines
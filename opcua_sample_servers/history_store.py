@@ -0,0 +1,248 @@
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from asyncua import ua
+from asyncua.server.history import HistoryStorageInterface, UaNodeAlreadyHistorizedError
+
+DEFAULT_CAPACITY = 100_000
+FLUSH_ROWS = 10_000
+# Open continuation points kept per store; the oldest is dropped first.
+MAX_CONTINUATIONS = 256
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Clients leave StartTime or EndTime at the OPC UA epoch to mean "open".
+UNSPECIFIED = ua.get_win_epoch()
+MIN_TIME = np.iinfo(np.int64).min
+MAX_TIME = np.iinfo(np.int64).max
+
+
+def to_micros(timestamp):
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def is_unspecified(timestamp):
+    return timestamp is None or to_micros(timestamp) <= to_micros(UNSPECIFIED)
+
+
+class RingBuffer:
+    # Timestamps (microseconds since 1970) and values of one node in two
+    # preallocated arrays. Values arrive in time order, so a time range is
+    # two binary searches per contiguous segment and no scan.
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1.")
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, micros, value):
+        index = (self.start + self.count) % self.capacity
+        self.times[index] = micros
+        self.values[index] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def oldest(self):
+        return int(self.times[self.start]) if self.count else None
+
+    def segments(self):
+        end = self.start + self.count
+        if end <= self.capacity:
+            return ((self.start, end),)
+        return (self.start, self.capacity), (0, end - self.capacity)
+
+    def range(self, lo, hi):
+        # Both bounds inclusive. Returns views unless the range wraps around.
+        times = []
+        values = []
+        for first, last in self.segments():
+            segment = self.times[first:last]
+            i = first + int(np.searchsorted(segment, lo, "left"))
+            j = first + int(np.searchsorted(segment, hi, "right"))
+            if i < j:
+                times.append(self.times[i:j])
+                values.append(self.values[i:j])
+        if not times:
+            return self.times[:0], self.values[:0]
+        if len(times) == 1:
+            return times[0], values[0]
+        return np.concatenate(times), np.concatenate(values)
+
+
+class HistoryStore(HistoryStorageInterface):
+    # asyncua history backend for numeric variables. The newest `capacity`
+    # values of every node stay in a RingBuffer. With `db_path` every value
+    # is also appended to an SQLite table indexed by node and time, in
+    # batches of FLUSH_ROWS or whenever flush() is called; reads reaching
+    # back past the ring buffer, e.g. after a restart, are served from there.
+    # `retention` (seconds) deletes older rows from the file on flush.
+    # The writer feeds values with record(); save_node_value() keeps the
+    # store usable with Server.historize_node_data_change() as well.
+    # asyncua passes a continuation point back as the start time of the next
+    # read, which loses the read direction and the values already returned
+    # at that timestamp, so the store remembers both for every continuation
+    # point it hands out.
+    def __init__(self, capacity=DEFAULT_CAPACITY, db_path=None, retention=None,
+                 max_history_data_response_size=10000):
+        super().__init__(max_history_data_response_size)
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1.")
+        if retention is not None and retention <= 0:
+            raise ValueError("History retention must be positive.")
+        self.capacity = capacity
+        self.db_path = db_path
+        self.retention = retention
+        self.buffers = {}
+        self.keys = {}
+        self.db = None
+        self.rows = []
+        self.continuations = OrderedDict()
+        self.newest = None
+        self.stored_until = None
+        self.values_recorded = 0
+        self.buffer_reads = 0
+        self.db_reads = 0
+
+    async def init(self):
+        if self.db_path and self.db is None:
+            self.db = sqlite3.connect(self.db_path)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS history "
+                            "(node TEXT NOT NULL, time INTEGER NOT NULL, value REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS history_node_time ON history (node, time)")
+            self.db.commit()
+            # Rows of an earlier run may be newer than this run's first values,
+            # e.g. after a fast simulation clock ran ahead of the wall clock.
+            self.stored_until = self.db.execute("SELECT MAX(time) FROM history").fetchone()[0]
+
+    async def new_historized_node(self, node_id, period, count=0):
+        if node_id in self.buffers:
+            raise UaNodeAlreadyHistorizedError(node_id)
+        self.buffers[node_id] = RingBuffer(count or self.capacity)
+        self.keys[node_id] = node_id.to_string()
+
+    def record(self, node_id, micros, value):
+        buffer = self.buffers.get(node_id)
+        if buffer is None:
+            return
+        buffer.append(micros, value)
+        self.values_recorded += 1
+        self.newest = micros
+        if self.db is not None:
+            self.rows.append((self.keys[node_id], micros, value))
+            if len(self.rows) >= FLUSH_ROWS:
+                self.flush()
+
+    async def save_node_value(self, node_id, datavalue):
+        timestamp = datavalue.SourceTimestamp or datavalue.ServerTimestamp or datetime.now(timezone.utc)
+        self.record(node_id, to_micros(timestamp), datavalue.Value.Value)
+
+    def flush(self):
+        if self.db is None or not self.rows:
+            return
+        with self.db:
+            self.db.executemany("INSERT INTO history (node, time, value) VALUES (?, ?, ?)", self.rows)
+            if self.retention is not None:
+                cutoff = self.newest - int(self.retention * 1_000_000)
+                self.db.executemany("DELETE FROM history WHERE node = ? AND time < ?",
+                                    [(key, cutoff) for key in self.keys.values()])
+        self.rows = []
+
+    def query(self, node_id, lo, hi, reverse, limit, skip):
+        self.flush()
+        order = "DESC" if reverse else "ASC"
+        # rowid keeps values sharing a timestamp in the same order on every page.
+        rows = self.db.execute(
+            f"SELECT time, value FROM history WHERE node = ? AND time BETWEEN ? AND ? "
+            f"ORDER BY time {order}, rowid {order} LIMIT ? OFFSET ?",
+            (self.keys[node_id], lo, hi, limit, skip)).fetchall()
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        times, values = zip(*rows)
+        return np.array(times, dtype=np.int64), np.array(values, dtype=np.float64)
+
+    async def read_node_history(self, node_id, start, end, nb_values):
+        buffer = self.buffers.get(node_id)
+        if buffer is None:
+            return [], None
+        end_key = None if is_unspecified(end) else to_micros(end)
+        continued = None
+        if not is_unspecified(start):
+            continued = self.continuations.pop((node_id, to_micros(start), end_key), None)
+        if continued is not None:
+            lo, hi, reverse, skip = continued
+        else:
+            skip = 0
+            # Without a start time, or with start after end, values come newest first.
+            if is_unspecified(start):
+                lo, hi, reverse = MIN_TIME, MAX_TIME if is_unspecified(end) else to_micros(end), True
+            elif is_unspecified(end):
+                lo, hi, reverse = to_micros(start), MAX_TIME, False
+            else:
+                lo, hi = to_micros(start), to_micros(end)
+                reverse = lo > hi
+                if reverse:
+                    lo, hi = hi, lo
+
+        # One value past the page tells whether a continuation point is needed.
+        page = self.max_history_data_response_size
+        if nb_values:
+            page = min(page, nb_values)
+        oldest = buffer.oldest()
+        if self.db is not None and (oldest is None or lo < oldest
+                                    or (self.stored_until is not None and lo <= self.stored_until)):
+            self.db_reads += 1
+            times, values = self.query(node_id, lo, hi, reverse, page + 1, skip)
+        else:
+            self.buffer_reads += 1
+            times, values = buffer.range(lo, hi)
+            if reverse:
+                times, values = times[::-1], values[::-1]
+            times, values = times[skip:skip + page + 1], values[skip:skip + page + 1]
+
+        cont = None
+        if len(times) > page:
+            # The next read covers the rest of the range from the first value
+            # not returned, skipping the values at its timestamp that were
+            # returned, on this page or, if the range starts there, before.
+            next_time = int(times[page])
+            returned = int(np.count_nonzero(times[:page] == next_time))
+            if next_time == (hi if reverse else lo):
+                returned += skip
+            if reverse:
+                remaining = (lo, next_time, True, returned)
+            else:
+                remaining = (next_time, hi, False, returned)
+            cont = EPOCH + timedelta(microseconds=next_time)
+            self.continuations[(node_id, next_time, end_key)] = remaining
+            while len(self.continuations) > MAX_CONTINUATIONS:
+                self.continuations.popitem(last=False)
+            times, values = times[:page], values[:page]
+        # Naive UTC datetimes, which asyncua encodes like aware ones.
+        timestamps = times.astype("datetime64[us]").tolist()
+        return [ua.DataValue(ua.Variant(value, ua.VariantType.Double),
+                             SourceTimestamp=timestamp, ServerTimestamp=timestamp)
+                for timestamp, value in zip(timestamps, values.tolist())], cont
+
+    async def read_event_history(self, source_id, start, end, nb_values, evfilter):
+        # Only variables are historized; event reads fail with a status code
+        # instead of returning an empty history.
+        raise ua.UaStatusCodeError(ua.StatusCodes.BadHistoryOperationUnsupported)
+
+    async def stop(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
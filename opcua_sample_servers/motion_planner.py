@@ -0,0 +1,195 @@
+import math
+
+import numpy as np
+
+from gcode_parser import RAPID
+
+CHUNK_SIZE = 1024
+
+
+class MotionProfile:
+    # Trapezoidal velocity profile along a straight path: accelerate at
+    # `accel`, cruise at `v_max`, decelerate to rest. Short moves never reach
+    # v_max and become triangular.
+    __slots__ = ("length", "v_max", "accel", "v_peak", "t_acc", "t_cruise", "duration")
+
+    def __init__(self, length, v_max, accel):
+        self.length = length
+        self.v_max = v_max
+        self.accel = accel
+        if length <= 0.0:
+            self.v_peak = self.t_acc = self.t_cruise = self.duration = 0.0
+            return
+        if length < v_max * v_max / accel:
+            self.v_peak = math.sqrt(length * accel)
+            self.t_cruise = 0.0
+        else:
+            self.v_peak = v_max
+            self.t_cruise = (length - v_max * v_max / accel) / v_max
+        self.t_acc = self.v_peak / accel
+        self.duration = 2.0 * self.t_acc + self.t_cruise
+
+    def evaluate(self, t):
+        a = self.accel
+        t_acc = self.t_acc
+        t_dec = t_acc + self.t_cruise
+        remaining = self.duration - t
+        phases = [t < t_acc, t < t_dec, remaining > 0.0]
+        s = np.select(phases, [0.5 * a * t * t,
+                               0.5 * a * t_acc * t_acc + self.v_peak * (t - t_acc),
+                               self.length - 0.5 * a * remaining * remaining], self.length)
+        v = np.select(phases, [a * t, self.v_peak, a * remaining], 0.0)
+        acc = np.select(phases, [a, 0.0, -a], 0.0)
+        return s, v, acc
+
+    def __getstate__(self):
+        return (self.length, self.v_max, self.accel, self.v_peak, self.t_acc, self.t_cruise, self.duration)
+
+    def __setstate__(self, state):
+        self.length, self.v_max, self.accel, self.v_peak, self.t_acc, self.t_cruise, self.duration = state
+
+
+class Trajectory:
+    # start and direction stay plain tuples until chunks() runs, so planning
+    # a whole program and pickling it for the program cache stay cheap.
+    __slots__ = ("start", "direction", "profile", "sample_period", "sample_count")
+
+    def __init__(self, start, end, profile, sample_period):
+        self.start = start = tuple(map(float, start))
+        length = profile.length
+        if length > 0.0:
+            self.direction = tuple((e - s) / length for s, e in zip(start, end))
+        else:
+            self.direction = (0.0,) * len(start)
+        self.profile = profile
+        self.sample_period = sample_period
+        self.sample_count = max(1, math.ceil(profile.duration / sample_period))
+
+    def __getstate__(self):
+        return (self.start, self.direction, self.profile, self.sample_period, self.sample_count)
+
+    def __setstate__(self, state):
+        self.start, self.direction, self.profile, self.sample_period, self.sample_count = state
+
+    @property
+    def duration(self):
+        return self.profile.duration
+
+    @property
+    def end(self):
+        # Same arithmetic as the last sample, so a plan chained from here
+        # matches one made from the live axis position.
+        length = self.profile.length
+        return tuple(s + length * d for s, d in zip(self.start, self.direction))
+
+    def last_sample(self):
+        # (t, position, velocity, acceleration) of the sample chunks() ends on.
+        t = min(self.sample_count * self.sample_period, self.profile.duration)
+        s, v, a = self.profile.evaluate(np.array([t]))
+        direction = np.array(self.direction)
+        return (t, (np.array(self.start) + s[0] * direction).tolist(),
+                (v[0] * direction).tolist(), (a[0] * direction).tolist())
+
+    def chunks(self, size=CHUNK_SIZE):
+        # Yields (t, position, velocity, acceleration) for up to `size` samples
+        # at a time; t is seconds since the start of the move, the other arrays
+        # are samples x axes. The last sample lands exactly on the endpoint.
+        start = np.array(self.start)
+        direction = np.array(self.direction)
+        for first in range(1, self.sample_count + 1, size):
+            index = np.arange(first, min(first + size, self.sample_count + 1))
+            t = np.minimum(index * self.sample_period, self.profile.duration)
+            s, v, a = self.profile.evaluate(t)
+            yield (t,
+                   start + np.outer(s, direction),
+                   np.outer(v, direction),
+                   np.outer(a, direction))
+
+
+class MotionPlanner:
+    # Rates are in program units (inch with G20, mm with G21) per minute as in
+    # F words; accelerations in program units per second squared.
+    def __init__(self, sample_rate=50.0, rapid_rate=400.0, max_acceleration=20.0,
+                 default_feed=20.0, max_spindle_rpm=4000.0, inch=False):
+        # Zero rates or accelerations would divide by zero, or never finish a
+        # move, inside a running job; reject them here instead.
+        for name, value in (("sample_rate", sample_rate), ("rapid_rate", rapid_rate),
+                            ("max_acceleration", max_acceleration), ("default_feed", default_feed),
+                            ("max_spindle_rpm", max_spindle_rpm)):
+            if not value > 0:
+                raise ValueError(f"Motion planner {name} must be positive, got {value!r}.")
+        self.sample_period = 1.0 / sample_rate
+        self.rapid_rate = rapid_rate
+        self.max_acceleration = max_acceleration
+        self.default_feed = default_feed
+        self.max_spindle_rpm = max_spindle_rpm
+        self.inch = inch
+        self.feed_per_rev = False
+        self.constant_surface_speed = False
+        self.spindle = 0.0
+        self.feed = 0.0
+
+    def state_key(self):
+        # Everything plan() depends on besides the block and start position.
+        return (self.sample_period, self.rapid_rate, self.max_acceleration, self.default_feed,
+                self.max_spindle_rpm, self.inch, self.feed_per_rev, self.constant_surface_speed,
+                self.spindle, self.feed)
+
+    def update_modes(self, block):
+        for code in block.g_codes:
+            if code == 20.0:
+                self.inch = True
+            elif code == 21.0:
+                self.inch = False
+            elif code in (94.0, 98.0):
+                self.feed_per_rev = False
+            elif code in (95.0, 99.0):
+                self.feed_per_rev = True
+            elif code == 96.0:
+                self.constant_surface_speed = True
+            elif code == 97.0:
+                self.constant_surface_speed = False
+        if block.s is not None:
+            self.spindle = block.s
+        if block.f is not None:
+            self.feed = block.f
+
+    def spindle_rpm(self, diameter):
+        if not self.constant_surface_speed:
+            return min(self.spindle, self.max_spindle_rpm)
+        if diameter <= 0.0:
+            return self.max_spindle_rpm
+        surface_factor = 12.0 if self.inch else 1000.0
+        return min(self.spindle * surface_factor / (math.pi * diameter), self.max_spindle_rpm)
+
+    def feed_velocity(self, block, diameter):
+        if block.motion == RAPID:
+            rate = self.rapid_rate
+        elif self.feed_per_rev:
+            rate = self.feed * self.spindle_rpm(diameter)
+        else:
+            rate = self.feed
+        if rate <= 0.0:
+            rate = self.default_feed
+        return min(rate, self.rapid_rate) / 60.0
+
+    def dwell_time(self, block):
+        if 4.0 not in block.g_codes:
+            return 0.0
+        if block.x is not None:
+            return block.x
+        for letter, value in block.words:
+            if letter == "P":
+                return value / 1000.0
+        return 0.0
+
+    def plan(self, block, position, targets):
+        if not block.has_motion:
+            return None
+        end = [position[i] if target is None else target for i, target in enumerate(targets)]
+        length = math.dist(position, end)
+        # Lathe X words are diameters; the smaller end of the cut sets the
+        # spindle speed under constant surface speed.
+        diameter = min(abs(position[0]), abs(end[0]))
+        profile = MotionProfile(length, self.feed_velocity(block, diameter), self.max_acceleration)
+        return Trajectory(position, end, profile, self.sample_period)
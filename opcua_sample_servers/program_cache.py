@@ -0,0 +1,300 @@
+import asyncio
+import copy
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+from gcode_parser import GCodeParser
+from gcode_stream import iter_text_lines
+
+CACHE_FORMAT = 1
+PLANS_PER_PROGRAM = 4
+DEFAULT_MAX_BLOCKS = 500_000
+
+
+def program_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_program_hash(key):
+    return len(key) == 64 and all(c in "0123456789abcdef" for c in key)
+
+
+def parse_program(key, text):
+    return CachedProgram(key, list(GCodeParser().iter_blocks(iter_text_lines(text))))
+
+
+def plan_blocks(blocks, planner, start):
+    # Changes the planner's modes; callers pass a copy of the live planner.
+    position = list(start)
+    plans = []
+    for block in blocks:
+        planner.update_modes(block)
+        trajectory = planner.plan(block, position, (block.x, block.z))
+        if trajectory is not None:
+            position = trajectory.end
+        plans.append(trajectory)
+    return plans
+
+
+class CachedProgram:
+    # Parsed blocks of one program plus its planned trajectories. A plan
+    # depends on where the axes start and on the planner's modal state, so
+    # plans are keyed by both; a cell that always starts from the same
+    # position reuses a single plan.
+    def __init__(self, key, blocks):
+        self.key = key
+        self.blocks = blocks
+        self.plans = OrderedDict()
+
+    @property
+    def block_count(self):
+        return len(self.blocks)
+
+    @property
+    def size(self):
+        # A plan holds one entry per block, so it weighs as much as the blocks.
+        return self.block_count * (1 + len(self.plans))
+
+    def plan_key(self, planner, start):
+        return planner.state_key(), tuple(start)
+
+    def cached_plans(self, plan_key):
+        plans = self.plans.get(plan_key)
+        if plans is not None:
+            self.plans.move_to_end(plan_key)
+        return plans
+
+    def add_plans(self, plan_key, plans):
+        self.plans[plan_key] = plans
+        while len(self.plans) > PLANS_PER_PROGRAM:
+            self.plans.popitem(last=False)
+
+    def snapshot(self):
+        # Shares blocks and plans, so a worker thread can pickle it while
+        # the original gains or drops plans.
+        program = CachedProgram(self.key, self.blocks)
+        program.plans = OrderedDict(self.plans)
+        return program
+
+
+class ProgramCache:
+    # LRU cache of parsed and planned programs keyed by the SHA-256 of their
+    # text, bounded by program count and by size: blocks plus the blocks of
+    # every cached plan. With `cache_dir` every entry is also pickled to
+    # <hash>.pickle, so after a restart a program that was cached before
+    # skips parsing and planning. compile(), lookup() and plan() do the work
+    # on the calling thread; the server uses their _async variants, which
+    # parse, unpickle, plan and pickle in the default executor and only
+    # touch the cache itself on the event loop.
+    def __init__(self, max_programs=64, max_blocks=DEFAULT_MAX_BLOCKS, cache_dir=None):
+        self.max_programs = max_programs
+        self.max_blocks = max_blocks
+        self.cache_dir = cache_dir
+        self.programs = OrderedDict()
+        self.names = {}
+        self.blocks = 0
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.prune_disk()
+
+    def __len__(self):
+        return len(self.programs)
+
+    def fits(self, text):
+        # Counts lines, an upper bound of the blocks, and one plan. Larger
+        # programs are streamed instead of cached.
+        return (text.count("\n") + 1) * 2 <= self.max_blocks
+
+    def compile(self, text):
+        # Raises GCodeParseError for invalid programs; nothing is cached then.
+        key = program_hash(text)
+        program = self.cached(key)
+        if program is None:
+            program, loaded = self.load_or_parse(key, text)
+            program = self.add(program, loaded)
+            if not loaded:
+                self.save(program)
+        return program
+
+    async def compile_async(self, text):
+        key = program_hash(text)
+        program = self.cached(key)
+        if program is None:
+            loop = asyncio.get_running_loop()
+            program, loaded = await loop.run_in_executor(None, self.load_or_parse, key, text)
+            program = self.add(program, loaded)
+            if not loaded:
+                await loop.run_in_executor(None, self.save, program.snapshot())
+        return program
+
+    def preload(self, name, text):
+        program = self.compile(text)
+        self.names[name] = program.key
+        return program
+
+    async def preload_async(self, name, text):
+        program = await self.compile_async(text)
+        self.names[name] = program.key
+        return program
+
+    def lookup(self, reference):
+        # `reference` is a preloaded name or a program hash.
+        program = self.get(self.names.get(reference, reference))
+        if program is not None:
+            self.hits += 1
+        return program
+
+    async def lookup_async(self, reference):
+        # Like lookup(), but a program found only on disk is unpickled in the
+        # default executor.
+        key = self.names.get(reference, reference)
+        program = self.cached(key)
+        if program is None:
+            program = await asyncio.get_running_loop().run_in_executor(None, self.load, key)
+            if program is None:
+                return None
+            program = self.add(program, True)
+        return program
+
+    def plan(self, program, planner, start):
+        plan_key = program.plan_key(planner, start)
+        plans = program.cached_plans(plan_key)
+        if plans is None:
+            plans = plan_blocks(program.blocks, copy.copy(planner), start)
+            if self.add_plans(program, plan_key, plans):
+                self.save(program)
+        return plans
+
+    async def plan_async(self, program, planner, start):
+        plan_key = program.plan_key(planner, start)
+        plans = program.cached_plans(plan_key)
+        if plans is None:
+            loop = asyncio.get_running_loop()
+            plans = await loop.run_in_executor(None, plan_blocks, program.blocks, copy.copy(planner), start)
+            if self.add_plans(program, plan_key, plans):
+                await loop.run_in_executor(None, self.save, program.snapshot())
+        return plans
+
+    def cached(self, key):
+        # Memory only; a program on disk is loaded by load_or_parse().
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            self.hits += 1
+        return program
+
+    def load_or_parse(self, key, text):
+        # Touches only the cache directory, so it may run in a worker thread.
+        program = self.load(key)
+        if program is not None:
+            return program, True
+        return parse_program(key, text), False
+
+    def add(self, program, loaded):
+        # Another call may have cached the same program in the meantime.
+        current = self.cached(program.key)
+        if current is not None:
+            return current
+        if loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.put(program)
+        return program
+
+    def add_plans(self, program, plan_key, plans):
+        # Returns False when the program was evicted while it was planned.
+        if self.programs.get(program.key) is not program:
+            return False
+        size = program.size
+        program.add_plans(plan_key, plans)
+        self.blocks += program.size - size
+        self.programs.move_to_end(program.key)
+        self.evict()
+        # Left alone over the bound, the program keeps only its newest plan.
+        while self.blocks > self.max_blocks and len(program.plans) > 1:
+            program.plans.popitem(last=False)
+            self.blocks -= program.block_count
+        return True
+
+    def get(self, key):
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            return program
+        program = self.load(key)
+        if program is not None:
+            self.put(program)
+        return program
+
+    def put(self, program):
+        old = self.programs.pop(program.key, None)
+        if old is not None:
+            self.blocks -= old.size
+        self.programs[program.key] = program
+        self.blocks += program.size
+        self.evict()
+
+    def evict(self):
+        while len(self.programs) > 1 and (len(self.programs) > self.max_programs or self.blocks > self.max_blocks):
+            _, evicted = self.programs.popitem(last=False)
+            self.blocks -= evicted.size
+            self.remove_file(evicted.key)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def save(self, program):
+        if not self.cache_dir or program.key not in self.programs:
+            return
+        path = self.path(program.key)
+        try:
+            with open(path + ".tmp", "wb") as cache_file:
+                pickle.dump((CACHE_FORMAT, program), cache_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Cannot write program cache entry {program.key}: {e}")
+
+    def load(self, key):
+        if not self.cache_dir or not is_program_hash(key):
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                cache_format, program = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Dropping unreadable program cache entry {key}: {e}")
+            self.remove_file(key)
+            return None
+        if cache_format != CACHE_FORMAT or program.key != key:
+            self.remove_file(key)
+            return None
+        return program
+
+    def remove_file(self, key):
+        if not self.cache_dir:
+            return
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def prune_disk(self):
+        # Keeps the most recently written entries from earlier runs so the
+        # directory stays within max_programs even without loading them.
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pickle") and entry.is_file():
+                entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_programs:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,32 @@
+import itertools
+
+IDLE = "idle"
+RUNNING = "running"
+COMPLETED = "completed"
+STOPPED = "stopped"
+FAILED = "failed"
+
+_job_ids = itertools.count(1)
+
+
+class ProgramJob:
+    __slots__ = ("job_id", "method_name", "block_count", "blocks_done", "current_line", "state", "task")
+
+    def __init__(self, method_name, block_count):
+        self.job_id = next(_job_ids)
+        self.method_name = method_name
+        self.block_count = block_count
+        self.blocks_done = 0
+        self.current_line = 0
+        self.state = RUNNING
+        self.task = None
+
+    @property
+    def running(self):
+        return self.state == RUNNING
+
+    @property
+    def percent(self):
+        if self.block_count == 0:
+            return 100.0
+        return 100.0 * self.blocks_done / self.block_count
@@ -0,0 +1,406 @@
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+from asyncua import Client, Server, ua, uamethod
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from opcua_common.diagnostics import DUMP_ENV_VAR, Diagnostics
+from opcua_common.profiling import PROFILE_ENV_VAR, Profiler
+
+DEFAULT_ENDPOINT = "opc.tcp://0.0.0.0:4840/cell"
+DEFAULT_CONVEYOR = "opc.tcp://192.168.1.2:4840/conveyor"
+DEFAULT_COBOT = "opc.tcp://192.168.1.3:4840/cobot_arm"
+# Mark in move_arm.json after which the arm is clear of the conveyor.
+DEFAULT_OVERLAP_AFTER = "returning"
+STRICT = "none"
+
+
+def uri_from_endpoint(endpoint, default):
+    if match := re.search(r"^opc\.tcp://(.*)/(.*)$", endpoint):
+        return match.group(2)
+    return default
+
+
+class CellFault(Exception):
+    pass
+
+
+class Stage:
+    # Busy and stall time of one machine while the cell runs. A stage is
+    # stalled while it waits for the other stage or an interlock.
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.stalled = 0.0
+        self.runs = 0
+
+    def utilization(self, elapsed):
+        return self.busy / elapsed * 100.0 if elapsed > 0 else 0.0
+
+
+class Machine:
+    # One cell server seen through two connections: `calls` runs the long
+    # methods, `monitor` holds the subscriptions and stays free for stop
+    # requests, since a server answers nothing else on a connection while a
+    # method runs there.
+    def __init__(self, endpoint, default_uri, interface, stale_after, on_change):
+        self.endpoint = endpoint
+        self.uri = uri_from_endpoint(endpoint, default_uri)
+        self.interface = interface
+        self.stale_after = stale_after
+        self.on_change = on_change
+        self.calls = None
+        self.monitor = None
+        self.watched = {}
+        self.values = {}
+        self.last_seen = None
+
+    @property
+    def connected(self):
+        return self.calls is not None
+
+    async def connect(self, watched=()):
+        self.calls = Client(self.endpoint, timeout=120, watchdog_intervall=3600)
+        self.monitor = Client(self.endpoint, timeout=10)
+        await self.calls.connect()
+        await self.monitor.connect()
+        self.ns = await self.monitor.get_namespace_index(self.uri)
+        nodes = []
+        for name in ("server timestamp",) + tuple(watched):
+            node = await self.node(self.monitor, name)
+            self.watched[node.nodeid] = name
+            nodes.append(node)
+        subscription = await self.monitor.create_subscription(100, self)
+        await subscription.subscribe_data_change(nodes)
+        # The first notification carries the current server timestamp.
+        deadline = time.monotonic() + self.stale_after
+        while self.last_seen is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def disconnect(self):
+        for client in (self.calls, self.monitor):
+            if client is not None:
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+        self.calls = self.monitor = None
+        self.last_seen = None
+
+    async def node(self, client, *path):
+        return await client.nodes.objects.get_child([f"{self.ns}:{name}" for name in (self.interface,) + path])
+
+    def datachange_notification(self, node, val, data):
+        name = self.watched.get(node.nodeid)
+        if name == "server timestamp":
+            self.last_seen = time.monotonic()
+        else:
+            self.values[name] = val
+        self.on_change(self, name, val)
+
+    def alive(self):
+        return self.last_seen is not None and time.monotonic() - self.last_seen < self.stale_after
+
+    async def call(self, client, path, method, *args):
+        parent = await self.node(client, *path)
+        return await parent.call_method(await parent.get_child(f"{self.ns}:{method}"), *args)
+
+
+class CellOrchestrator:
+    # Runs the pick-and-place cell as a two-stage pipeline: the conveyor
+    # supplies a part to the pick position, the cobot picks and places it.
+    # Interlocks:
+    #   - the conveyor only moves while the pick position is empty and the
+    #     arm is clear of the conveyor,
+    #   - the cobot only picks a part the conveyor has supplied,
+    #   - both servers must have published their server timestamp within
+    #     `stale_after` seconds before every call,
+    #   - a method that returns False faults the cell and stops the arm.
+    # The arm counts as clear once its motion phase reaches `overlap_after`
+    # (a waypoint mark in move_arm.json), so the next supply overlaps the
+    # rest of the motion. With "none" the cell runs strictly in sequence.
+    def __init__(self, endpoint=DEFAULT_ENDPOINT, conveyor_endpoint=DEFAULT_CONVEYOR, cobot_endpoint=DEFAULT_COBOT,
+                 overlap_after=DEFAULT_OVERLAP_AFTER, stale_after=5.0, stats_interval=1.0, diagnostics_dump=None,
+                 profile_dir=None):
+        self.endpoint = endpoint
+        self.overlap_after = None if overlap_after in (None, "", STRICT) else overlap_after
+        self.stats_interval = stats_interval
+        self.conveyor = Machine(conveyor_endpoint, "conveyor", "conveyor interface", stale_after, self.machine_changed)
+        self.cobot = Machine(cobot_endpoint, "cobot_arm", "cobot interface", stale_after, self.machine_changed)
+        self.changed = asyncio.Event()
+        self.diagnostics = Diagnostics(dump_path=diagnostics_dump or os.environ.get(DUMP_ENV_VAR))
+        self.profile_dir = profile_dir or os.environ.get(PROFILE_ENV_VAR)
+        self.server = None
+        self.nodes = None
+        self.task = None
+        self.reset()
+
+    def reset(self):
+        self.state = "idle"
+        self.stages = {"conveyor": Stage("conveyor"), "cobot": Stage("cobot")}
+        self.part_ready = False
+        self.zone_free = True
+        self.picking = False
+        self.arm_started = False
+        self.parts_done = 0
+        self.cycle_time = 0.0
+        self.last_done = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self):
+        elapsed = self.elapsed
+        return self.parts_done / elapsed * 3600.0 if elapsed > 0 else 0.0
+
+    def machine_changed(self, machine, name, value):
+        if machine is self.cobot and name == "motion phase" and self.picking:
+            # Only a mark that follows the start of this pick counts; a late
+            # notification from the previous motion must not free the zone.
+            if value == "move_arm":
+                self.arm_started = True
+            elif value == self.overlap_after and self.arm_started:
+                self.release_pick_zone()
+        self.changed.set()
+
+    def release_pick_zone(self):
+        # The part has left the pick position and the arm the conveyor.
+        if self.picking:
+            self.picking = False
+            self.part_ready = False
+            self.zone_free = True
+            self.changed.set()
+
+    def check_alive(self, machine):
+        if not machine.alive():
+            raise CellFault(f"no server timestamp from {machine.endpoint} for {machine.stale_after:g} s")
+
+    async def wait_until(self, ready, stage):
+        start = time.monotonic()
+        while not ready():
+            self.changed.clear()
+            await self.changed.wait()
+        stage.stalled += time.monotonic() - start
+
+    async def run_stage(self, stage, machine, path, method, *args):
+        self.check_alive(machine)
+        start = time.monotonic()
+        result = await machine.call(machine.calls, path, method, *args)
+        stage.busy += time.monotonic() - start
+        stage.runs += 1
+        if result is False:
+            raise CellFault(f"{method} on {machine.endpoint} returned False")
+
+    async def supply_parts(self, parts):
+        stage = self.stages["conveyor"]
+        supplied = 0
+        while not parts or supplied < parts:
+            await self.wait_until(lambda: not self.part_ready and self.zone_free, stage)
+            await self.run_stage(stage, self.conveyor, (), "move_and_supply")
+            supplied += 1
+            self.part_ready = True
+            self.changed.set()
+
+    async def pick_parts(self, parts):
+        stage = self.stages["cobot"]
+        while not parts or self.parts_done < parts:
+            await self.wait_until(lambda: self.part_ready, stage)
+            self.zone_free = False
+            self.picking = True
+            self.arm_started = False
+            await self.run_stage(stage, self.cobot, ("move functions channel",), "move_arm", True)
+            self.release_pick_zone()
+            now = time.monotonic()
+            if self.last_done is not None:
+                self.cycle_time = now - self.last_done
+            self.last_done = now
+            self.parts_done += 1
+
+    async def stop_arm(self):
+        try:
+            await self.cobot.call(self.cobot.monitor, ("move functions channel",), "move_arm", False)
+        except Exception as e:
+            print(f"Could not stop the cobot: {e}")
+
+    async def run(self, parts=0):
+        # Runs `parts` parts, or until stopped with 0.
+        self.reset()
+        self.state = "running"
+        self.started = time.monotonic()
+        tasks = [asyncio.create_task(self.supply_parts(parts)), asyncio.create_task(self.pick_parts(parts))]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+            self.state = "done"
+        except CellFault as e:
+            self.state = f"fault: {e}"
+            print(f"Cell fault: {e}")
+        except asyncio.CancelledError:
+            self.state = "stopped"
+            raise
+        finally:
+            arm_moving = self.picking
+            for task in tasks:
+                task.cancel()
+            self.finished = time.monotonic()
+            if arm_moving and self.state != "done":
+                await self.stop_arm()
+            await self.publish()
+            print(f"Cell {self.state} after {self.parts_done} parts, {self.throughput:.1f} parts/h.")
+
+    async def connect(self):
+        for machine, watched in ((self.conveyor, ()), (self.cobot, ("motion phase",))):
+            if not machine.connected:
+                try:
+                    await machine.connect(watched)
+                except Exception:
+                    await machine.disconnect()
+                    raise
+
+    async def disconnect(self):
+        await self.conveyor.disconnect()
+        await self.cobot.disconnect()
+
+    async def generate_opc_model(self, server, namespace_id):
+        cell_interface = await server.nodes.objects.add_object(namespace_id, "cell interface")
+        self.nodes = {
+            "state": await cell_interface.add_variable(namespace_id, "state", self.state),
+            "overlap": await cell_interface.add_variable(namespace_id, "overlap after", self.overlap_after or STRICT),
+            "parts": await cell_interface.add_variable(namespace_id, "parts completed", 0, ua.VariantType.UInt64),
+            "throughput": await cell_interface.add_variable(namespace_id, "throughput parts per hour", 0.0),
+            "cycle_time": await cell_interface.add_variable(namespace_id, "cycle time s", 0.0),
+            "conveyor_utilization": await cell_interface.add_variable(namespace_id, "conveyor utilization %", 0.0),
+            "cobot_utilization": await cell_interface.add_variable(namespace_id, "cobot utilization %", 0.0),
+            "conveyor_stall": await cell_interface.add_variable(namespace_id, "conveyor stall s", 0.0),
+            "cobot_stall": await cell_interface.add_variable(namespace_id, "cobot stall s", 0.0),
+        }
+
+        parts_arg = ua.Argument()
+        parts_arg.Name = "Parts"
+        parts_arg.DataType = ua.NodeId(ua.ObjectIds.UInt32)
+        result = ua.Argument()
+        result.Name = "Execution Result"
+        result.DataType = ua.NodeId(ua.ObjectIds.Boolean)
+        instrument = self.diagnostics.instrument
+        await cell_interface.add_method(namespace_id, "start_cell", instrument("start_cell", self.start_cell),
+                                        [parts_arg], [result])
+        await cell_interface.add_method(namespace_id, "stop_cell", instrument("stop_cell", self.stop_cell), [], [result])
+
+        self.diagnostics.server = server
+        self.diagnostics.count_writes(server)
+        diagnostics = await self.diagnostics.add_nodes(cell_interface, namespace_id)
+        if self.profile_dir:
+            await Profiler(self.profile_dir).add_methods(diagnostics, namespace_id)
+
+    async def publish(self):
+        if self.nodes is None:
+            return
+        elapsed = self.elapsed
+        conveyor, cobot = self.stages["conveyor"], self.stages["cobot"]
+        values = (
+            ("state", ua.Variant(self.state, ua.VariantType.String)),
+            ("parts", ua.Variant(self.parts_done, ua.VariantType.UInt64)),
+            ("throughput", ua.Variant(self.throughput, ua.VariantType.Double)),
+            ("cycle_time", ua.Variant(self.cycle_time, ua.VariantType.Double)),
+            ("conveyor_utilization", ua.Variant(conveyor.utilization(elapsed), ua.VariantType.Double)),
+            ("cobot_utilization", ua.Variant(cobot.utilization(elapsed), ua.VariantType.Double)),
+            ("conveyor_stall", ua.Variant(conveyor.stalled, ua.VariantType.Double)),
+            ("cobot_stall", ua.Variant(cobot.stalled, ua.VariantType.Double)),
+        )
+        for key, variant in values:
+            await self.server.write_attribute_value(self.nodes[key].nodeid, ua.DataValue(variant))
+
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def start(self, parts=0):
+        if self.running():
+            print("Cell is already running.")
+            return False
+        try:
+            await self.connect()
+        except Exception as e:
+            print(f"Cannot connect to the cell: {e}")
+            return False
+        self.task = asyncio.create_task(self.run(parts))
+        return True
+
+    @uamethod
+    async def start_cell(self, parent, parts):
+        print(f"Starting cell for {parts or 'unlimited'} parts...")
+        return await self.start(parts)
+
+    @uamethod
+    async def stop_cell(self, parent):
+        if not self.running():
+            return False
+        print("Stopping cell...")
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    async def start_server(self, start_parts=None):
+        self.server = Server()
+        await self.server.init()
+        self.server.set_endpoint(self.endpoint)
+        namespace_id = await self.server.register_namespace(uri_from_endpoint(self.endpoint, "cell"))
+        await self.generate_opc_model(self.server, namespace_id)
+
+        async with self.server:
+            print(f"OPC UA Server started at {self.endpoint}")
+            diagnostics_task = asyncio.create_task(self.diagnostics.run())
+            if start_parts is not None:
+                await self.start(start_parts)
+            try:
+                while True:
+                    await self.publish()
+                    await asyncio.sleep(self.stats_interval)
+            finally:
+                diagnostics_task.cancel()
+                if self.running():
+                    self.task.cancel()
+                await self.disconnect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the conveyor and cobot as a pipelined pick-and-place cell.")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT, help=f"orchestrator endpoint (default: {DEFAULT_ENDPOINT})")
+    parser.add_argument("--conveyor", default=DEFAULT_CONVEYOR, help=f"conveyor server (default: {DEFAULT_CONVEYOR})")
+    parser.add_argument("--cobot", default=DEFAULT_COBOT, help=f"cobot server (default: {DEFAULT_COBOT})")
+    parser.add_argument("--overlap-after", default=DEFAULT_OVERLAP_AFTER,
+                        help="move_arm mark after which the next part is supplied, or 'none' to run strictly "
+                             f"in sequence (default: {DEFAULT_OVERLAP_AFTER})")
+    parser.add_argument("--stale-after", type=float, default=5.0,
+                        help="fault the cell if a server timestamp is older than this many seconds (default: 5)")
+    parser.add_argument("--start", type=int, metavar="PARTS",
+                        help="start the cell right away for this many parts, 0 runs until stop_cell")
+    parser.add_argument("--diagnostics-dump",
+                        help="rewrite this file every second with the diagnostics in Prometheus text format")
+    parser.add_argument("--profile-dir",
+                        help="add the profile_loop and trace_memory admin methods, saving their files here")
+    args = parser.parse_args(argv)
+
+    orchestrator = CellOrchestrator(args.endpoint, args.conveyor, args.cobot, args.overlap_after, args.stale_after,
+                                    diagnostics_dump=args.diagnostics_dump, profile_dir=args.profile_dir)
+    try:
+        asyncio.run(orchestrator.start_server(args.start))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
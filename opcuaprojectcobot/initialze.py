@@ -1,31 +1,16 @@
-import RPi.GPIO as GPIO
+import os
+import sys
 from time import sleep
-                                                              
-GPIO.setmode(GPIO.BCM)
-pwmPin16 = 16
-GPIO.setup(pwmPin16, GPIO.OUT)
-pwm16=GPIO.PWM(pwmPin16,50)
-pwm16.start(0)
 
-pwmPin25 = 25
-GPIO.setup(pwmPin25, GPIO.OUT)
-pwm25=GPIO.PWM(pwmPin25,50)
-pwm25.start(0)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from opcua_common.actuators import backend_from_env
 
-pwmPin23 = 23
-GPIO.setup(pwmPin23, GPIO.OUT)
-pwm23=GPIO.PWM(pwmPin23,50)
-pwm23.start(0)
-
-pwmPin24 = 24
-GPIO.setup(pwmPin24, GPIO.OUT)
-pwm24=GPIO.PWM(pwmPin24,50)
-pwm24.start(0)
-
-pwmPin26 = 26
-GPIO.setup(pwmPin26, GPIO.OUT)
-pwm26=GPIO.PWM(pwmPin26,50)
-pwm26.start(0)
+actuators = backend_from_env()
+pwm16 = actuators.pwm(16)
+pwm25 = actuators.pwm(25)
+pwm23 = actuators.pwm(23)
+pwm24 = actuators.pwm(24)
+pwm26 = actuators.pwm(26)
 
 
 try:
@@ -44,6 +29,6 @@ try:
     pwm26.ChangeDutyCycle(float(12.5))
     sleep(0.5)
 
-    GPIO.cleanup()
+    actuators.cleanup()
 except KeyboardInterrupt:
-    GPIO.cleanup()
\ No newline at end of file
+    actuators.cleanup()
\ No newline at end of file
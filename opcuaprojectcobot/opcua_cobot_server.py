@@ -2,166 +2,164 @@ import asyncio
 from asyncua import ua, uamethod, Server
 from datetime import datetime, timezone
 import re, sys, os
-import RPi.GPIO as GPIO
 from time import sleep
 
-pwm_objects = {}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from opcua_common.actuators import ChannelPool, backend_from_env
+from opcua_common.button import ButtonWatcher
+from opcua_common.command_queue import CommandQueue
+from opcua_common.diagnostics import DUMP_ENV_VAR, Diagnostics
+from opcua_common.heartbeat import PeriodicPublisher
+from opcua_common.motion import MotionExecutor, load_motions
+from opcua_common.profiling import PROFILE_ENV_VAR, Profiler
+from opcua_common.sim_clock import SimClock
+from opcua_common.telemetry import ABSOLUTE, JointTelemetry
 
-def get_or_create_pwm(pin, frequency=50):
-    if pin not in pwm_objects:
-        GPIO.setup(pin, GPIO.OUT)
-        new_pwm = GPIO.PWM(pin, frequency)
-        new_pwm.start(0)
-        pwm_objects[pin] = new_pwm 
-    return pwm_objects[pin]
+actuators = backend_from_env()
+channels = ChannelPool(actuators)
+clock = SimClock.from_env()
 
+# Waypoint files: joints.json names the servo pins, every other file is a
+# motion. move_arm and reference_cobot keep their own methods, the rest are
+# registered under the move functions channel by file name.
+MOTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "motions")
+BUILTIN_MOTIONS = ("move_arm", "reference_cobot")
+joints, motions = load_motions(MOTIONS_DIR)
+
+# "motion phase" shows the running motion, then the mark of the waypoint
+# it has reached, and "idle" between motions.
+phase_node = None
+server_ref = None
+
+
+async def publish_phase(phase):
+    if phase_node is not None:
+        await server_ref.write_attribute_value(phase_node.nodeid, ua.DataValue(ua.Variant(phase, ua.VariantType.String)))
+
+
+executor = MotionExecutor(channels, on_mark=publish_phase)
+# Every servo command goes through this queue, one at a time.
+commands = CommandQueue()
+diagnostics = Diagnostics()
 
 def stop_all_servos():
-    for pwm_obj in pwm_objects.values():
-        pwm_obj.stop()
-    pwm_objects.clear()
+    channels.idle_all()
+
+
+def stop_after_error():
+    # Only the servos stop; a full cleanup would also remove the button setup.
+    stop_all_servos()
+    executor.reset()
 
 
 def cleanup_gpio():
-    GPIO.cleanup()
+    channels.close()
+    actuators.cleanup()
+    executor.reset()
     print("GPIO cleanup completed.")
 
 BUTTON_PIN = 6
 
-async def monitor_button():
+async def monitor_button(button):
 
     while True:
-        button_state = GPIO.input(BUTTON_PIN)
-        if button_state == 0:
-            print("Physical button pressed - shutting down system...")
-            stop_all_servos()
-            cleanup_gpio()
-            os.system("sudo shutdown -h now")
-        await asyncio.sleep(0.1)
+        edge_time = await button.wait_pressed()
+        commands.cancel_all()
+        stop_all_servos()
+        print(f"Physical button pressed - servos stopped after {button.reacted(edge_time) * 1000:.1f} ms.")
+        if not await button.confirm():
+            print("Button released again, not shutting down.")
+            continue
+        print("Shutting down system...")
+        cleanup_gpio()
+        actuators.shutdown()
 
 
-@uamethod
-async def move_arm(parent, command_bool):
+async def run_motion(name):
+    await publish_phase(name)
     try:
-        GPIO.setmode(GPIO.BCM)
-
-        pwm16 = get_or_create_pwm(16)
-        pwm25 = get_or_create_pwm(25)
-        pwm23 = get_or_create_pwm(23)
-        pwm24 = get_or_create_pwm(24)
-        pwm26 = get_or_create_pwm(26)
-
-        if command_bool:
-            print("Moving arm...")
-            pwm25.ChangeDutyCycle(8.5)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(3.5)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(6)
-            await asyncio.sleep(1)
-            pwm16.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            pwm24.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(4)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(10)
-            await asyncio.sleep(1)
-            pwm25.ChangeDutyCycle(10.5)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(6)
-            await asyncio.sleep(1)
-            pwm25.ChangeDutyCycle(9)
-            await asyncio.sleep(1)
-            pwm16.ChangeDutyCycle(3.5)
-            await asyncio.sleep(1)
-            pwm25.ChangeDutyCycle(11)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(4)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(10)
-            await asyncio.sleep(1)
-            pwm25.ChangeDutyCycle(9.5)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(3.5)
-            await asyncio.sleep(1)
-            print("Arm movement completed.")
-
-            print("Going to home position...")
-            pwm16.ChangeDutyCycle(7)
-            await asyncio.sleep(1)
-            pwm25.ChangeDutyCycle(8)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(10)
-            await asyncio.sleep(1)
-            pwm23.ChangeDutyCycle(3.5)
-            await asyncio.sleep(1)
-            pwm24.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            pwm26.ChangeDutyCycle(12.5)
-            await asyncio.sleep(1)
-            stop_all_servos()
-        else:
-            print("Stopping arm movement...")
+        await executor.run(motions[name], clock)
+    finally:
+        await publish_phase("idle")
+
+
+async def stop_motion():
+    stop_all_servos()
+    print("Arm movement stopped.")
+
 
+async def move_arm_command():
+    try:
+        print("Moving arm...")
+        await run_motion("move_arm")
+        print("Arm movement completed.")
     except Exception as e:
         print(f"Error during arm movement: {e}")
-        cleanup_gpio()
+        stop_after_error()
 
-    return True
 
 @uamethod
-async def reference_cobot(parent):
+async def move_arm(parent, command_bool):
+    if command_bool:
+        return await commands.submit("move_arm", move_arm_command)
+    print("Stopping arm movement...")
+    return await commands.preempt("stop", stop_motion)
+
+
+async def reference_cobot_command():
     try:
         print("Referencing Cobot...")
-        pwm16 = get_or_create_pwm(16)
-        pwm25 = get_or_create_pwm(25)
-        pwm23 = get_or_create_pwm(23)
-        pwm24 = get_or_create_pwm(24)
-        pwm26 = get_or_create_pwm(26)
-
-        pwm16.ChangeDutyCycle(7)
-        await asyncio.sleep(1)
-        pwm25.ChangeDutyCycle(8)
-        await asyncio.sleep(1)
-        pwm26.ChangeDutyCycle(10)
-        await asyncio.sleep(1)
-        pwm23.ChangeDutyCycle(3.5)
-        await asyncio.sleep(1)
-        pwm24.ChangeDutyCycle(12.5)
-        await asyncio.sleep(1)
-        pwm26.ChangeDutyCycle(12.5)
-        await asyncio.sleep(1)
-
+        await run_motion("reference_cobot")
         print("Cobot referenced successfully.")
-        stop_all_servos()
 
     except Exception as e:
         print(f"Error during referencing: {e}")
-        cleanup_gpio()
+        stop_after_error()
 
-    return True
 
 @uamethod
-async def stop_cobot(parent):
-    print("Cobot stopping, and shutting down the system...")
-    await asyncio.sleep(3)
+async def reference_cobot(parent):
+    return await commands.submit("reference_cobot", reference_cobot_command)
+
+
+def motion_method(name):
+    async def command():
+        try:
+            print(f"Running motion {name}...")
+            await run_motion(name)
+            print(f"Motion {name} completed.")
+        except Exception as e:
+            print(f"Error during motion {name}: {e}")
+            stop_after_error()
+
+    @uamethod
+    async def run(parent):
+        return await commands.submit(name, command)
+    return run
+
+
+async def shutdown_command():
     stop_all_servos()
+    await asyncio.sleep(3)
     cleanup_gpio()
-    os.system("sudo shutdown -h now")
-    return True
+    actuators.shutdown()
+
 
+@uamethod
+async def stop_cobot(parent):
+    print("Cobot stopping, and shutting down the system...")
+    return await commands.preempt("stop_cobot", shutdown_command)
 
-async def generate_opc_model(server, namespace_id):
+
+async def generate_opc_model(server, namespace_id, heartbeat_interval=1.0, heartbeat_skip_unmonitored=False,
+                             telemetry_interval=0.1, telemetry_deadband=5.0, telemetry_deadband_type=ABSOLUTE,
+                             profile_dir=None):
     cobot_interface = await server.nodes.objects.add_object(namespace_id, "cobot interface")
 
+    global phase_node, server_ref
     claw_position = await cobot_interface.add_variable(namespace_id, "claw position", 0.0)
+    phase_node = await cobot_interface.add_variable(namespace_id, "motion phase", "idle")
+    server_ref = server
     server_timestamp = await cobot_interface.add_variable(namespace_id, "server timestamp", datetime.now(timezone.utc))
 
     await cobot_interface.add_property(namespace_id, "Manufacturer", "HomeBuiltCobot")
@@ -177,14 +175,39 @@ async def generate_opc_model(server, namespace_id):
     method_true_output.Name = "Execution Result"
     method_true_output.DataType = ua.NodeId(ua.ObjectIds.Boolean)
 
-    await move_functions_channel.add_method(namespace_id, "move_arm", move_arm, [move_arm_arg], [method_true_output])
-    await cobot_interface.add_method(namespace_id, "reference_cobot", reference_cobot, [], [method_true_output])
-    await cobot_interface.add_method(namespace_id, "stop_cobot", stop_cobot, [], [method_true_output])
+    await move_functions_channel.add_method(namespace_id, "move_arm", diagnostics.instrument("move_arm", move_arm),
+                                            [move_arm_arg], [method_true_output])
+    await cobot_interface.add_method(namespace_id, "reference_cobot",
+                                     diagnostics.instrument("reference_cobot", reference_cobot), [], [method_true_output])
+    await cobot_interface.add_method(namespace_id, "stop_cobot", diagnostics.instrument("stop_cobot", stop_cobot),
+                                     [], [method_true_output])
+    for name in motions:
+        if name not in BUILTIN_MOTIONS:
+            await move_functions_channel.add_method(namespace_id, name, diagnostics.instrument(name, motion_method(name)),
+                                                    [], [method_true_output])
+
+    heartbeat = PeriodicPublisher(server, server_timestamp, heartbeat_interval,
+                                  skip_unmonitored=heartbeat_skip_unmonitored)
+    await heartbeat.add_stats_nodes(cobot_interface, namespace_id)
+
+    commands.server = server
+    await commands.add_nodes(cobot_interface, namespace_id)
+
+    telemetry = JointTelemetry(server, executor, joints, telemetry_interval, telemetry_deadband, telemetry_deadband_type)
+    await telemetry.add_nodes(cobot_interface, namespace_id, claw_node=claw_position)
+
+    diagnostics.server = server
+    diagnostics.count_writes(server)
+    diagnostics_node = await diagnostics.add_nodes(cobot_interface, namespace_id)
+    if profile_dir:
+        await Profiler(profile_dir).add_methods(diagnostics_node, namespace_id)
 
-    return server_timestamp
+    return heartbeat, telemetry
 
 
-async def start_server(endpoint="opc.tcp://192.168.1.3:4840/cobot_arm"):
+async def start_server(endpoint="opc.tcp://192.168.1.3:4840/cobot_arm", heartbeat_interval=1.0, heartbeat_skip_unmonitored=False,
+                       telemetry_interval=0.1, telemetry_deadband=5.0, telemetry_deadband_type=ABSOLUTE,
+                       diagnostics_dump=None, profile_dir=None):
 
     server = Server()
     await server.init()
@@ -197,24 +220,29 @@ async def start_server(endpoint="opc.tcp://192.168.1.3:4840/cobot_arm"):
         uri = "cobot_arm"
 
     namespace_id = await server.register_namespace(uri)
-    server_timestamp = await generate_opc_model(server, namespace_id)
+    heartbeat, telemetry = await generate_opc_model(server, namespace_id, heartbeat_interval, heartbeat_skip_unmonitored,
+                                                    telemetry_interval, telemetry_deadband, telemetry_deadband_type,
+                                                    profile_dir or os.environ.get(PROFILE_ENV_VAR))
 
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    channels.open(joint.pin for joint in joints.values())
+    actuators.setup_button(BUTTON_PIN)
+    button = ButtonWatcher(actuators, BUTTON_PIN)
+    diagnostics.dump_path = diagnostics_dump or os.environ.get(DUMP_ENV_VAR)
 
     async with server:
         print(f"OPC UA Server started at {endpoint}")
 
-        asyncio.create_task(monitor_button())
+        button.start()
+        asyncio.create_task(monitor_button(button))
+        asyncio.create_task(commands.run())
+        asyncio.create_task(telemetry.run())
+        asyncio.create_task(diagnostics.run())
 
-        while True:
-            await server_timestamp.write_value(datetime.now(timezone.utc))
-            await asyncio.sleep(1)
+        await heartbeat.run()
 
 
 if __name__ == "__main__":
     try:
-        GPIO.setmode(GPIO.BCM)
         asyncio.run(start_server())
     except (KeyboardInterrupt, SystemExit):
         cleanup_gpio()
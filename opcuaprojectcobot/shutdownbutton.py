@@ -2,7 +2,7 @@ from time import sleep
 import RPi.GPIO as GPIO
 import os
 
-delay = 0.1
+debounce = 0.05
 inPin = 6
 outPin = 38
 
@@ -13,14 +13,15 @@ GPIO.setup(inPin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
 try:
     while True:
-        buttonState = GPIO.input(inPin)
-        print(buttonState)
-        if buttonState == 0:
+        # Sleeps in the kernel until the button pulls the pin low.
+        GPIO.wait_for_edge(inPin, GPIO.FALLING, bouncetime=int(debounce * 1000))
+        # Ignore glitches shorter than the debounce time.
+        sleep(debounce)
+        if GPIO.input(inPin) == 0:
+            print("Button pressed - shutting down system...")
             os.system("sudo shutdown -h now")
-        else:
-            pass
-        sleep(0.1)
+            break
 
 except KeyboardInterrupt:
     GPIO.cleanup()
-    print("GPIO good to go")
\ No newline at end of file
+    print("GPIO good to go")
@@ -2,79 +2,79 @@ import asyncio
 from asyncua import ua, uamethod, Server
 from datetime import datetime, timezone
 import re, sys, os
-import RPi.GPIO as GPIO
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from opcua_common.actuators import ChannelPool, backend_from_env
+from opcua_common.button import ButtonWatcher
+from opcua_common.diagnostics import DUMP_ENV_VAR, Diagnostics
+from opcua_common.heartbeat import PeriodicPublisher
+from opcua_common.profiling import PROFILE_ENV_VAR, Profiler
+from opcua_common.sim_clock import SimClock
 
-pwm_objects = {}
+
+actuators = backend_from_env()
+channels = ChannelPool(actuators)
+clock = SimClock.from_env()
+diagnostics = Diagnostics()
 
 
 SERVO_PIN = 18
 BUTTON_PIN = 6
 
-def get_or_create_pwm(pin, frequency=50):
-
-    if pin not in pwm_objects:
-        GPIO.setup(pin, GPIO.OUT)
-        new_pwm = GPIO.PWM(pin, frequency)
-        new_pwm.start(0)
-        pwm_objects[pin] = new_pwm
-    return pwm_objects[pin]
-
 def stop_all_servos():
-
-    for pwm_obj in pwm_objects.values():
-        pwm_obj.stop()
-    pwm_objects.clear()
+    channels.idle_all()
 
 def cleanup_gpio():
-
-    GPIO.cleanup()
+    channels.close()
+    actuators.cleanup()
     print("GPIO cleanup completed.")
 
-async def monitor_button():
+async def monitor_button(button):
 
     while True:
-        button_state = GPIO.input(BUTTON_PIN)
-        if button_state == 0:
-            print("Physical button pressed - shutting down system...")
-            stop_all_servos()
-            cleanup_gpio()
-            os.system("sudo shutdown -h now")
-        await asyncio.sleep(0.1)
+        edge_time = await button.wait_pressed()
+        stop_all_servos()
+        print(f"Physical button pressed - servos stopped after {button.reacted(edge_time) * 1000:.1f} ms.")
+        if not await button.confirm():
+            print("Button released again, not shutting down.")
+            continue
+        print("Shutting down system...")
+        cleanup_gpio()
+        actuators.shutdown()
 
 @uamethod
 async def initialize(parent):
 
     try:
-        GPIO.setmode(GPIO.BCM)
-        servo_pwm = get_or_create_pwm(SERVO_PIN)
+        servo = channels.channel(SERVO_PIN)
         print("Initializing conveyor...")
-        servo_pwm.ChangeDutyCycle(12.5)
-        await asyncio.sleep(1)
+        servo.drive(12.5)
+        await clock.sleep(1)
         stop_all_servos()
         print("Conveyor initialized.")
     except Exception as e:
         print(f"Error during initialization: {e}")
-        cleanup_gpio()
+        # Not a full cleanup, which would also remove the button setup.
+        stop_all_servos()
     return True
 
 @uamethod
 async def move_and_supply(parent):
 
     try:
-        GPIO.setmode(GPIO.BCM)
-        servo_pwm = get_or_create_pwm(SERVO_PIN)
+        servo = channels.channel(SERVO_PIN)
         print("Moving conveyor and supplying items...")
-        servo_pwm.ChangeDutyCycle(3)
-        await asyncio.sleep(1)
+        servo.drive(3)
+        await clock.sleep(1)
         stop_all_servos()
         print("Conveyor movement and supply completed.")
     except Exception as e:
         print(f"Error during move and supply: {e}")
-        cleanup_gpio()
+        stop_all_servos()
     return True
 
-async def generate_opc_model(server, namespace_id):
+async def generate_opc_model(server, namespace_id, heartbeat_interval=1.0, heartbeat_skip_unmonitored=False,
+                             profile_dir=None):
 
     conveyor_interface = await server.nodes.objects.add_object(namespace_id, "conveyor interface")
 
@@ -82,12 +82,23 @@ async def generate_opc_model(server, namespace_id):
     await conveyor_interface.add_property(namespace_id, "Manufacturer", "HomeBuiltConveyor")
     await conveyor_interface.add_property(namespace_id, "Version", "1.0")
 
-    await conveyor_interface.add_method(namespace_id, "initialize", initialize, [], [ua.Argument(Name="Execution Result", DataType=ua.NodeId(ua.ObjectIds.Boolean))])
-    await conveyor_interface.add_method(namespace_id, "move_and_supply", move_and_supply, [], [ua.Argument(Name="Execution Result", DataType=ua.NodeId(ua.ObjectIds.Boolean))])
+    await conveyor_interface.add_method(namespace_id, "initialize", diagnostics.instrument("initialize", initialize), [], [ua.Argument(Name="Execution Result", DataType=ua.NodeId(ua.ObjectIds.Boolean))])
+    await conveyor_interface.add_method(namespace_id, "move_and_supply", diagnostics.instrument("move_and_supply", move_and_supply), [], [ua.Argument(Name="Execution Result", DataType=ua.NodeId(ua.ObjectIds.Boolean))])
 
-    return server_timestamp
+    heartbeat = PeriodicPublisher(server, server_timestamp, heartbeat_interval,
+                                  skip_unmonitored=heartbeat_skip_unmonitored)
+    await heartbeat.add_stats_nodes(conveyor_interface, namespace_id)
 
-async def start_server(endpoint="opc.tcp://192.168.1.2:4840/conveyor"):
+    diagnostics.server = server
+    diagnostics.count_writes(server)
+    diagnostics_node = await diagnostics.add_nodes(conveyor_interface, namespace_id)
+    if profile_dir:
+        await Profiler(profile_dir).add_methods(diagnostics_node, namespace_id)
+
+    return heartbeat
+
+async def start_server(endpoint="opc.tcp://192.168.1.2:4840/conveyor", heartbeat_interval=1.0, heartbeat_skip_unmonitored=False,
+                       diagnostics_dump=None, profile_dir=None):
 
     server = Server()
     await server.init()
@@ -99,26 +110,27 @@ async def start_server(endpoint="opc.tcp://192.168.1.2:4840/conveyor"):
         uri = "conveyor"
 
     namespace_id = await server.register_namespace(uri)
-    server_timestamp = await generate_opc_model(server, namespace_id)
+    heartbeat = await generate_opc_model(server, namespace_id, heartbeat_interval, heartbeat_skip_unmonitored,
+                                         profile_dir or os.environ.get(PROFILE_ENV_VAR))
 
 
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    channels.open([SERVO_PIN])
+    actuators.setup_button(BUTTON_PIN)
+    button = ButtonWatcher(actuators, BUTTON_PIN)
+    diagnostics.dump_path = diagnostics_dump or os.environ.get(DUMP_ENV_VAR)
 
     async with server:
         print(f"OPC UA Server started at {endpoint}")
 
 
-        asyncio.create_task(monitor_button())
-
+        button.start()
+        asyncio.create_task(monitor_button(button))
+        asyncio.create_task(diagnostics.run())
 
-        while True:
-            await server_timestamp.write_value(datetime.now(timezone.utc))
-            await asyncio.sleep(1)
+        await heartbeat.run()
 
 if __name__ == "__main__":
     try:
-        GPIO.setmode(GPIO.BCM)
         asyncio.run(start_server())
     except (KeyboardInterrupt, SystemExit):
         cleanup_gpio()
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from asyncua import ua
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from block_writer import BlockWriter  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+class Session:
+    # Stands in for the internal session: keeps every Write call.
+    def __init__(self):
+        self.writes = []
+
+    async def write(self, params):
+        self.writes.append({value.NodeId.Identifier: value.Value.Value.Value for value in params.NodesToWrite})
+        return [ua.StatusCode() for _ in params.NodesToWrite]
+
+
+def node(identifier):
+    return SimpleNamespace(nodeid=ua.NodeId(identifier, 2))
+
+
+def writer():
+    session = Session()
+    return BlockWriter(SimpleNamespace(iserver=SimpleNamespace(isession=session))), session
+
+
+def commit(block_writer, seconds, values, force=False):
+    for target, value in values:
+        block_writer.set(target, value)
+    asyncio.run(block_writer.commit(START + timedelta(seconds=seconds), force))
+
+
+def test_unchanged_values_are_not_written():
+    block_writer, session = writer()
+    x, z = node(1), node(2)
+    commit(block_writer, 0, [(x, 1.0), (z, 2.0)])
+    commit(block_writer, 1, [(x, 1.0), (z, 3.0)])
+    commit(block_writer, 2, [(x, 1.0), (z, 3.0)])
+    assert session.writes == [{1: 1.0, 2: 2.0}, {2: 3.0}]
+    assert block_writer.blocks_written == 2
+    assert block_writer.values_written == 3
+    assert block_writer.suppressed_unchanged == 3
+
+
+def test_deadband_drops_small_changes():
+    block_writer, session = writer()
+    x = node(1)
+    block_writer.set_filter(x, deadband=0.5)
+    commit(block_writer, 0, [(x, 1.0)])
+    commit(block_writer, 1, [(x, 1.4)])
+    commit(block_writer, 2, [(x, 1.6)])
+    assert session.writes == [{1: 1.0}, {1: 1.6}]
+    assert block_writer.suppressed_deadband == 1
+
+
+def test_min_interval_holds_back_until_a_later_commit():
+    block_writer, session = writer()
+    x, z = node(1), node(2)
+    block_writer.set_filter(x, min_interval=1.0)
+    commit(block_writer, 0, [(x, 1.0)])
+    commit(block_writer, 0.2, [(x, 2.0)])
+    # The held value is replaced before it goes out.
+    commit(block_writer, 0.4, [(x, 3.0)])
+    # z has no filter and is written at once; x still waits.
+    commit(block_writer, 0.6, [(z, 5.0)])
+    assert session.writes == [{1: 1.0}, {2: 5.0}]
+    assert block_writer.deferred == 2
+    # A commit with nothing new still sends the held value once the interval is over.
+    commit(block_writer, 1.2, [(z, 5.0)])
+    assert session.writes[-1] == {1: 3.0}
+    assert block_writer.suppressed == 3
+
+
+def test_force_skips_deadband_and_interval():
+    block_writer, session = writer()
+    x = node(1)
+    block_writer.set_filter(x, deadband=0.5, min_interval=1.0)
+    commit(block_writer, 0, [(x, 1.0)])
+    commit(block_writer, 0.1, [(x, 1.1)], force=True)
+    assert session.writes == [{1: 1.0}, {1: 1.1}]
+    assert block_writer.suppressed == 0
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import socket
+import sys
+import time
+
+from asyncua import Client
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "opcua_sample_servers"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_gcode_parser import make_turning_program  # noqa: E402
+from cnc_simulator import OPCUAServer  # noqa: E402
+from opcua_common.sim_clock import SimClock  # noqa: E402
+
+LINES = 2000
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def wait_started(endpoint):
+    for _ in range(200):
+        try:
+            async with Client(endpoint):
+                return
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"{endpoint} did not start")
+
+
+def test_fast_clock_runs_program_in_seconds():
+    async def run():
+        endpoint = f"opc.tcp://127.0.0.1:{free_port()}/cnc"
+        simulator = OPCUAServer(endpoint, "cnc", clock=SimClock.from_string("fast"))
+        server_task = asyncio.create_task(simulator.start_server())
+        try:
+            await wait_started(endpoint)
+            async with Client(endpoint, timeout=60) as client:
+                ns = await client.get_namespace_index("cnc")
+                channel = await client.nodes.objects.get_child(
+                    [f"{ns}:cnc interface", f"{ns}:cnc channel list", f"{ns}:g function channel"])
+                method = await channel.get_child(f"{ns}:run_g_code")
+                started = time.perf_counter()
+                accepted, _ = await channel.call_method(method, make_turning_program(LINES))
+                assert accepted
+                while simulator.job.running:
+                    await asyncio.sleep(0.01)
+                elapsed = time.perf_counter() - started
+            return simulator, elapsed
+        finally:
+            simulator.server_running = False
+            await server_task
+
+    simulator, elapsed = asyncio.run(run())
+    assert simulator.job.state == "completed"
+    # Virtual time covers hours of cutting; the writer commits about once per block.
+    assert simulator.clock.now() > 3600
+    assert simulator.block_writer.blocks_written < 2 * LINES
+    assert elapsed < 5
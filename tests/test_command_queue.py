@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from opcua_common.command_queue import CommandQueue  # noqa: E402
+
+
+def test_commands_run_one_at_a_time_in_order():
+    async def run():
+        queue = CommandQueue()
+        runner = asyncio.create_task(queue.run())
+        log = []
+
+        def command(name):
+            async def body():
+                log.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                log.append(f"{name} end")
+            return body
+
+        results = await asyncio.gather(queue.submit("a", command("a")), queue.submit("b", command("b")))
+        runner.cancel()
+        return queue, log, results
+
+    queue, log, results = asyncio.run(run())
+    assert log == ["a start", "a end", "b start", "b end"]
+    assert results == [True, True]
+    assert queue.completed == 2
+
+
+def test_preempt_cancels_running_and_queued_commands():
+    async def run():
+        queue = CommandQueue()
+        runner = asyncio.create_task(queue.run())
+        started = asyncio.Event()
+        log = []
+
+        async def move():
+            started.set()
+            await asyncio.sleep(60)
+            log.append("move finished")
+
+        async def stop():
+            log.append("stop")
+
+        running = asyncio.create_task(queue.submit("move", move))
+        await started.wait()
+        waiting = asyncio.create_task(queue.submit("move", move))
+        await asyncio.sleep(0)
+        stopped = await asyncio.wait_for(queue.preempt("stop", stop), 1)
+        results = [await running, await waiting, stopped]
+        runner.cancel()
+        return queue, log, results
+
+    queue, log, results = asyncio.run(run())
+    assert results == [False, False, True]
+    assert log == ["stop"]
+    assert queue.cancelled == 2
+    assert queue.completed == 1
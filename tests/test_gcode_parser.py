@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from gcode_parser import LINEAR, RAPID, GCodeParseError, GCodeParser, check_program  # noqa: E402
+
+
+def blocks(text):
+    return list(GCodeParser().iter_blocks(text.splitlines()))
+
+
+def test_words_comments_and_modal_motion():
+    parsed = blocks("%\n(header)\nN10 G00 X1.5 Z-2 (rapid)\nx2 ; lower case, modal G00\n\nG01 Z.5 F0.2 S450 M3 T0101 P7\n")
+    assert [block.line_number for block in parsed] == [3, 4, 6]
+    first, second, third = parsed
+    assert (first.n, first.motion, first.x, first.z, first.comment) == (10, RAPID, 1.5, -2.0, "rapid")
+    assert (second.motion, second.x, second.z, second.comment) == (RAPID, 2.0, None, "lower case, modal G00")
+    assert (third.motion, third.z, third.f, third.s, third.m_codes, third.t) == (LINEAR, 0.5, 0.2, 450.0, (3,), 101)
+    assert third.words == (("P", 7.0),)
+
+
+def test_dwell_is_not_motion():
+    block, = blocks("G01 G04 X2")
+    assert block.g_codes == (4.0,)
+    assert not block.has_motion
+
+
+@pytest.mark.parametrize("line, message", [
+    ("G01 X1 X2", "duplicate X word"),
+    ("G00 G01 X1", "more than one motion code in block"),
+    ("G01 X1 (open", "unterminated comment"),
+    ("G01 X", "word X has no value"),
+    ("G01 X1 #", "unexpected character '#'"),
+])
+def test_errors_report_line_and_text(line, message):
+    with pytest.raises(GCodeParseError) as error:
+        blocks(f"G00 X0\n\n{line}\nG00 X1")
+    assert error.value.line_number == 3
+    assert error.value.message == message
+    assert error.value.text == line
+    assert str(error.value) == f"line 3: {message}"
+
+
+def test_check_program_counts_blocks():
+    assert check_program(["%", "G00 X1", "(comment)", "G01 Z2", ""]) == 2
+    with pytest.raises(GCodeParseError):
+        check_program(["G00 X1", "G01 Z"])
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from gcode_stream import ProgramUploads, iter_text_lines, resolve_program_path  # noqa: E402
+
+
+@pytest.fixture
+def program_dir(tmp_path):
+    programs = tmp_path / "programs"
+    (programs / "parts").mkdir(parents=True)
+    (programs / "parts" / "shaft.nc").write_text("G00 X1\n")
+    (tmp_path / "secret.nc").write_text("G00 X2\n")
+    return programs
+
+
+def test_resolves_programs_inside_the_directory(program_dir):
+    assert resolve_program_path("parts/shaft.nc", str(program_dir)) == str(program_dir / "parts" / "shaft.nc")
+
+
+@pytest.mark.parametrize("path", ["../secret.nc", "parts/../../secret.nc"])
+def test_rejects_paths_outside_the_directory(program_dir, path):
+    with pytest.raises(ValueError, match="outside the program directory"):
+        resolve_program_path(path, str(program_dir))
+
+
+def test_rejects_absolute_paths_outside_the_directory(program_dir):
+    with pytest.raises(ValueError):
+        resolve_program_path(str(program_dir.parent / "secret.nc"), str(program_dir))
+
+
+def test_rejects_symlinks_leaving_the_directory(program_dir):
+    os.symlink(program_dir.parent / "secret.nc", program_dir / "link.nc")
+    with pytest.raises(ValueError):
+        resolve_program_path("link.nc", str(program_dir))
+
+
+def test_missing_program(program_dir):
+    with pytest.raises(FileNotFoundError):
+        resolve_program_path("parts/missing.nc", str(program_dir))
+
+
+def test_iter_text_lines_matches_split():
+    # Like split, except that a trailing newline gives no empty last line.
+    assert list(iter_text_lines("a\n\nb")) == ["a", "", "b"]
+    assert list(iter_text_lines("a\nb\n")) == ["a", "b"]
+    assert list(iter_text_lines("")) == []
+
+
+def test_uploads_are_separate(tmp_path):
+    uploads = ProgramUploads(spool_dir=str(tmp_path))
+    first = uploads.begin()
+    second = uploads.begin()
+    uploads.get(first).append("G00 X1\n")
+    uploads.get(second).append("G01 Z2\n")
+    uploads.get(first).append("G00 X3\n")
+    program_file = uploads.commit(first)
+    program_file.seek(0)
+    assert program_file.read() == "G00 X1\nG00 X3\n"
+    program_file.close()
+    with pytest.raises(RuntimeError):
+        uploads.get(first)
+    assert uploads.get(second).size == 7
+
+
+def test_oldest_upload_is_dropped(tmp_path):
+    uploads = ProgramUploads(spool_dir=str(tmp_path), max_uploads=2)
+    first = uploads.begin()
+    uploads.begin()
+    uploads.begin()
+    with pytest.raises(RuntimeError):
+        uploads.get(first)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from asyncua import ua
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from history_store import UNSPECIFIED, HistoryStore  # noqa: E402
+
+NODE = ua.NodeId(1, 2)
+LIMIT = 50
+START = 1_700_000_000_000_000
+
+
+def trace():
+    # 300 values one millisecond apart, with runs of values sharing a
+    # timestamp across the page boundaries.
+    values = []
+    for i in range(300):
+        step = 45 if 45 <= i < 60 else 95 if 95 <= i < 160 else i
+        values.append((START + step * 1000, float(i)))
+    return values
+
+
+def read_all(store, start, end, nb_values=0):
+    async def pages():
+        values = []
+        count = 0
+        cont = start
+        while True:
+            page, cont = await store.read_node_history(NODE, cont, end, nb_values)
+            assert len(page) <= (nb_values or LIMIT)
+            values += [value.Value.Value for value in page]
+            count += 1
+            if cont is None:
+                return values, count
+    return asyncio.run(pages())
+
+
+@pytest.fixture(params=["buffer", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "buffer":
+        store = HistoryStore(capacity=1000, max_history_data_response_size=LIMIT)
+    else:
+        # A small ring buffer sends the reads to the database.
+        store = HistoryStore(capacity=10, db_path=str(tmp_path / "history.db"),
+                             max_history_data_response_size=LIMIT)
+
+    async def setup():
+        await store.init()
+        await store.new_historized_node(NODE, None)
+        for micros, value in trace():
+            store.record(NODE, micros, value)
+    asyncio.run(setup())
+    yield store
+    asyncio.run(store.stop())
+
+
+def timestamp(micros):
+    return datetime(1970, 1, 1) + timedelta(microseconds=micros)
+
+
+def test_forward_read_pages_through_trace(store):
+    values, pages = read_all(store, timestamp(START), UNSPECIFIED)
+    assert values == [value for _, value in trace()]
+    assert pages == 6
+
+
+def test_reverse_read_without_start_pages_through_trace(store):
+    values, pages = read_all(store, UNSPECIFIED, UNSPECIFIED)
+    assert values == [value for _, value in reversed(trace())]
+    assert pages == 6
+
+
+def test_reverse_read_with_end_pages_through_range(store):
+    end = START + 200_000
+    values, _ = read_all(store, UNSPECIFIED, timestamp(end))
+    assert values == [value for micros, value in reversed(trace()) if micros <= end]
+
+
+def test_reverse_range_pages_through_range(store):
+    values, _ = read_all(store, timestamp(START + 250_000), timestamp(START + 45_000))
+    assert values == [value for micros, value in reversed(trace()) if START + 45_000 <= micros <= START + 250_000]
+
+
+def test_capped_read_returns_continuation_point(store):
+    values, pages = read_all(store, timestamp(START), timestamp(START + 400_000), nb_values=10)
+    assert values == [value for _, value in trace()]
+    assert pages == 30
+
+
+def test_event_history_is_unsupported(store):
+    with pytest.raises(ua.UaStatusCodeError) as error:
+        asyncio.run(store.read_event_history(NODE, UNSPECIFIED, UNSPECIFIED, 0, None))
+    assert error.value.code == ua.StatusCodes.BadHistoryOperationUnsupported
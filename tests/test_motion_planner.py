@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from gcode_parser import GCodeParser  # noqa: E402
+from motion_planner import MotionPlanner  # noqa: E402
+
+
+@pytest.mark.parametrize("name", ["sample_rate", "rapid_rate", "max_acceleration", "default_feed", "max_spindle_rpm"])
+@pytest.mark.parametrize("value", [0.0, -1.0])
+def test_planner_rejects_non_positive_settings(name, value):
+    with pytest.raises(ValueError, match=name):
+        MotionPlanner(**{name: value})
+
+
+def test_zero_feed_falls_back_to_default_feed():
+    planner = MotionPlanner(default_feed=30.0)
+    block = next(GCodeParser().iter_blocks(["G01 X10 F0"]))
+    planner.update_modes(block)
+    trajectory = planner.plan(block, [0.0, 0.0], (block.x, block.z))
+    assert trajectory.profile.v_max == pytest.approx(0.5)
+    assert 0 < trajectory.duration < 60
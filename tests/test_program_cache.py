@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "opcua_sample_servers"))
+
+from motion_planner import MotionPlanner  # noqa: E402
+from program_cache import PLANS_PER_PROGRAM, ProgramCache  # noqa: E402
+
+START = (0.0, 0.0)
+
+
+def program(moves):
+    return "\n".join(f"G01 X{i + 1} F100" for i in range(moves))
+
+
+def test_lookup_async_loads_program_from_disk(tmp_path):
+    cache = ProgramCache(cache_dir=str(tmp_path))
+    cached = cache.preload("part", program(20))
+    cache.plan(cached, MotionPlanner(), START)
+
+    restarted = ProgramCache(cache_dir=str(tmp_path))
+    loaded = asyncio.run(restarted.lookup_async(cached.key))
+    assert loaded.key == cached.key
+    assert loaded.block_count == 20
+    assert len(loaded.plans) == 1
+    assert len(restarted) == 1
+    assert restarted.hits == 1
+    assert asyncio.run(restarted.lookup_async(cached.key)) is loaded
+    assert asyncio.run(restarted.lookup_async("0" * 64)) is None
+
+
+def test_compile_counts_hits_and_misses():
+    cache = ProgramCache()
+    first = cache.compile(program(5))
+    assert cache.compile(program(5)) is first
+    assert (cache.hits, cache.misses, cache.blocks) == (1, 1, 5)
+
+
+def test_least_recently_used_program_is_evicted_first():
+    cache = ProgramCache(max_programs=2)
+    a = cache.compile(program(1))
+    b = cache.compile(program(2))
+    cache.compile(program(1))
+    cache.compile(program(3))
+    assert cache.lookup(a.key) is a
+    assert cache.lookup(b.key) is None
+    assert len(cache) == 2
+
+
+def test_plans_count_towards_the_size_bound():
+    cache = ProgramCache(max_blocks=60)
+    a = cache.compile(program(10))
+    cache.plan(a, MotionPlanner(), START)
+    assert cache.blocks == 20
+    b = cache.compile(program(20))
+    cache.plan(b, MotionPlanner(), START)
+    assert cache.blocks == 60
+    # A second plan of b needs 20 more blocks; a goes.
+    cache.plan(b, MotionPlanner(), (1.0, 1.0))
+    assert cache.lookup(a.key) is None
+    assert len(b.plans) == 2
+    assert cache.blocks == b.size == 60
+
+
+def test_program_alone_over_the_bound_keeps_its_newest_plan():
+    cache = ProgramCache(max_blocks=30)
+    a = cache.compile(program(10))
+    for i in range(3):
+        cache.plan(a, MotionPlanner(), (float(i), 0.0))
+    assert len(a.plans) == 2
+    assert cache.blocks == a.size == 30
+    assert list(a.plans)[-1][1] == (2.0, 0.0)
+
+
+def test_plans_per_program_are_bounded():
+    cache = ProgramCache()
+    a = cache.compile(program(3))
+    for i in range(PLANS_PER_PROGRAM + 2):
+        cache.plan(a, MotionPlanner(), (float(i), 0.0))
+    assert len(a.plans) == PLANS_PER_PROGRAM
+    assert cache.blocks == 3 * (1 + PLANS_PER_PROGRAM)
+
+
+def test_fits_leaves_room_for_one_plan():
+    cache = ProgramCache(max_blocks=20)
+    assert cache.fits(program(10))
+    assert not cache.fits(program(11))